@@ -0,0 +1,111 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Weeks start on Monday, as on the dashboard; see _period()
+FREQUENCIES = {
+    'Daily': 'D',
+    'Weekly': 'W-MON',
+    'Monthly': 'MS',
+}
+
+
+def build_log_frame(logs, activities, start=0, end=None):
+    """Columnar view of LogTable rows ``start:end``: activity_key, date, duration, completed."""
+    # Sessions append while reports read, so every column is cut at one row count
+    end = len(logs) if end is None else end
+    keys_by_name = {act['name']: key for key, act in activities.items()}
+    # Resolve and parse each distinct activity and date once, then index by row
+    keys = np.array(
+        [activity_id or keys_by_name.get(name) for activity_id, name in logs.activities.values],
+        dtype=object
+    )
+    dates = pd.to_datetime(pd.Index(logs.dates.values, dtype=object))
+    frame = pd.DataFrame({
+        'activity_key': keys[np.array(logs.activity[start:end], dtype=np.int64)],
+        'date': dates.take(np.array(logs.date[start:end], dtype=np.int64)),
+        'duration': np.array(logs.duration[start:end], dtype=float),
+        'completed': np.array(logs.completed[start:end], dtype=bool),
+    })
+    return frame.dropna(subset=['activity_key'])
+
+
+class LogFrameCache:
+    """Keeps one DataFrame per logs table and extends it as logs are appended."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._logs = None
+        self._activities = None
+        self._rows = 0
+        self._frame = None
+
+    def frame(self, logs, activities):
+        with self._lock:
+            rows = len(logs)
+            if logs is not self._logs or activities is not self._activities:
+                self._frame = build_log_frame(logs, activities, 0, rows)
+            elif rows > self._rows:
+                tail = build_log_frame(logs, activities, self._rows, rows)
+                self._frame = pd.concat([self._frame, tail], ignore_index=True)
+            self._logs, self._activities, self._rows = logs, activities, rows
+            return self._frame
+
+
+_frames = {}
+_frames_lock = threading.Lock()
+
+
+def get_log_frame(logs, activities, namespace=None):
+    with _frames_lock:
+        if namespace not in _frames:
+            _frames[namespace] = LogFrameCache()
+        cache = _frames[namespace]
+    return cache.frame(logs, activities)
+
+
+def _between(frame, start=None, end=None):
+    if start is not None:
+        frame = frame[frame['date'] >= pd.Timestamp(start)]
+    if end is not None:
+        frame = frame[frame['date'] <= pd.Timestamp(end)]
+    return frame
+
+
+def _period(freq):
+    # Weekly offsets default to right-closed bins labelled by their last day;
+    # left-closed, left-labelled bins are weeks from Monday, labelled Monday
+    return pd.Grouper(key='date', freq=freq, closed='left', label='left')
+
+
+def activity_totals(frame, freq='D', start=None, end=None):
+    """Seconds per activity (columns) for each day, week or month (rows)."""
+    frame = _between(frame, start, end)
+    if frame.empty:
+        return pd.DataFrame()
+    return (
+        frame.groupby([_period(freq), 'activity_key'])['duration']
+        .sum()
+        .unstack(fill_value=0.0)
+    )
+
+
+def target_hit_rates(frame, activities, freq='D', start=None, end=None):
+    """Share of tracked days in each period on which an activity met its target."""
+    targets = pd.Series(
+        {key: act['duration'] for key, act in activities.items() if act['duration']},
+        dtype=float
+    )
+    frame = _between(frame, start, end)
+    frame = frame[frame['activity_key'].isin(targets.index)]
+    if frame.empty:
+        return pd.DataFrame()
+    daily = frame.groupby(['activity_key', pd.Grouper(key='date', freq='D')])['duration'].sum()
+    hits = (daily >= targets.reindex(daily.index.get_level_values('activity_key')).to_numpy())
+    hits = hits.reset_index(name='hit')
+    return (
+        hits.groupby([_period(freq), 'activity_key'])['hit']
+        .mean()
+        .unstack()
+    )
@@ -1,145 +1,63 @@
 import streamlit as st
+import streamlit.components.v1 as components
 from datetime import datetime, timedelta, date
 import json
 import os
+import re
+import time
 import uuid
 import calendar
 from streamlit_autorefresh import st_autorefresh
+from streamlit_cookies_manager import CookieManager
+from datastore import ConflictError, get_store
+import metrics
+from metrics import profiled
+from scheduler import get_scheduler
+from analytics import FREQUENCIES, activity_totals, get_log_frame, target_hit_rates
+from recurrence import WEEKDAYS, describe, validate_rule
+from render import (
+    CSS_INJECTOR, activity_card_html, activity_row_html, day_event_html, format_duration, heatmap_html,
+    notebook_card_html, progress_html, reminder_card_html, upcoming_event_html
+)
 
-# Dark Theme CSS
-st.markdown("""
-<style>
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;600&display=swap');
-    
-    * {
-        font-family: 'Inter', sans-serif;
-    }
-    
-    .stApp {
-        background: #1a1a1a;
-        color: #ffffff;
-    }
-    
-    .compact-card {
-        padding: 1rem;
-        border-radius: 8px;
-        margin: 1rem 0;
-        background: #2d2d2d;
-        border-left: 4px solid;
-    }
-    
-    .corner-timer {
-        position: fixed;
-        bottom: 20px;
-        right: 20px;
-        background: #2d2d2d;
-        padding: 1rem 2rem;
-        border-radius: 8px;
-        color: #ffffff;
-        border: 1px solid #404040;
-        z-index: 999;
-        box-shadow: 0 2px 8px rgba(0,0,0,0.3);
-    }
-    
-    .progress-container {
-        margin: 1rem 0;
-        padding: 0.5rem;
-    }
-    
-    .calendar-day {
-        width: 100% !important;
-        height: 60px !important;
-        margin: 2px 0 !important;
-    }
-    
-    .reminder-item {
-        padding: 0.5rem;
-        margin: 0.5rem 0;
-        border-left: 4px solid;
-        background: #2d2d2d;
-        border-radius: 4px;
-    }
-    
-    .notes-container {
-        border-left: 4px solid;
-        padding: 1rem;
-        margin: 1rem 0;
-        background: #2d2d2d;
-        border-radius: 8px;
-    }
-    
-    .notes-preview {
-        padding: 1rem;
-        background: #1a1a1a;
-        border-radius: 8px;
-        border: 1px solid #404040;
-        margin: 1rem 0;
-        color: #ffffff;
-    }
-    
-    .notes-editor {
-        margin: 1rem 0;
-    }
-    
-    .notes-toolbar {
-        margin-bottom: 1rem;
-    }
-    
-    .formatting-help {
-        font-size: 0.8em;
-        color: #a0a0a0;
-        padding: 0.5rem;
-        background: #2d2d2d;
-        border-radius: 8px;
-        margin: 1rem 0;
-    }
-    
-    .upcoming-event {
-        padding: 0.5rem;
-        margin: 0.5rem 0;
-        border-radius: 8px;
-        background: #2d2d2d;
-    }
-    
-    .stTextInput input, .stTextArea textarea {
-        background-color: #2d2d2d !important;
-        color: #ffffff !important;
-    }
-    
-    .stSelectbox select {
-        background-color: #2d2d2d !important;
-        color: #ffffff !important;
-    }
-    
-    .stDateInput input {
-        background-color: #2d2d2d !important;
-        color: #ffffff !important;
-    }
-    
-    .stTimeInput input {
-        background-color: #2d2d2d !important;
-        color: #ffffff !important;
-    }
-    
-    .stButton button {
-        background-color: #4f8bf9;
-        color: white;
-        border: none;
-        border-radius: 4px;
-        padding: 0.5rem 1rem;
-    }
-    
-    .stButton button:hover {
-        background-color: #3b6bb8;
-        color: white;
-    }
-    
-    .stProgress > div > div > div {
-        background-color: #4f8bf9 !important;
-    }
-</style>
-""", unsafe_allow_html=True)
+MULTI_USER = os.environ.get('PRODUCTIVITY_MULTI_USER') == '1'
+# While other sessions are open, a session showing shared live state (a
+# running timer or a section listed here) reruns this often to show their
+# changes; other sessions pick changes up on their next interaction
+SYNC_SECONDS = float(os.environ.get('PRODUCTIVITY_SYNC_SECONDS', '5'))
+LIVE_SECTIONS = ("Calendar Events",)
+# Changes made outside this process only show up through a full reload
+RESYNC_SECONDS = 30
+# Lists render one page of cards at a time
+PAGE_SIZE = 20
+NOTEBOOK_PAGE_SIZE = 12
 
+@profiled('phase')
+def resolve_namespace():
+    # In multi-user mode each browser gets a random user id kept in a cookie
+    if not MULTI_USER:
+        return None
+    cookies = CookieManager(prefix="productivity/")
+    if not cookies.ready():
+        st.stop()
+    user_id = cookies.get('user_id')
+    if not user_id or not re.fullmatch(r'[0-9a-f]{32}', user_id):
+        user_id = uuid.uuid4().hex
+        cookies['user_id'] = user_id
+        cookies.save()
+    return user_id
+
+def current_store():
+    return get_store(st.session_state.get('namespace'))
+
+@profiled('phase')
+def inject_css():
+    # The stylesheet lands in the page head, so it is sent once per session
+    if not st.session_state.get('css_injected'):
+        components.html(CSS_INJECTOR, height=0)
+        st.session_state.css_injected = True
+
+@profiled('phase')
 def init_session_state():
     session_defaults = {
         'current_activity': None,
@@ -151,77 +69,115 @@ def init_session_state():
         'notes': [],
         'calendar_view': date.today(),
         'selected_date': None,
-        'selected_notebook': None
+        'selected_notebook': None,
+        'seen_reminder_seq': None,
+        'namespace': None,
+        'session_id': uuid.uuid4().hex,
+        'feed_version': None,
+        'synced_at': 0.0
     }
     for key, value in session_defaults.items():
         if key not in st.session_state:
             st.session_state[key] = value
 
+def sync_timer(key, start_time):
+    if key not in st.session_state.activities:
+        key, start_time = None, None
+    st.session_state.current_activity = key
+    st.session_state.start_time = start_time
+
+@profiled('phase')
 def load_data():
-    os.makedirs('data', exist_ok=True)
+    # Collections are shared across sessions. A session applies the store's
+    # change feed since its last rerun and only checks storage in full when
+    # it fell behind the feed or every RESYNC_SECONDS.
     try:
-        if os.path.exists('data/activities.json'):
-            with open('data/activities.json', 'r') as f:
-                st.session_state.activities = json.load(f)
+        store = current_store()
+        store.feed.seen(st.session_state.session_id)
+        deltas = None
+        if st.session_state.feed_version is not None:
+            deltas = store.feed.since(st.session_state.feed_version)
+        if deltas is None or time.monotonic() - st.session_state.synced_at > RESYNC_SECONDS:
+            # Taken before loading, so changes made meanwhile are applied next time
+            st.session_state.feed_version = store.feed.version
+            data = store.load_all()
+            st.session_state.activities = data['activities']
+            st.session_state.reminders = data['reminders']
+            st.session_state.calendar_events = data['calendar_events']
+            st.session_state.notes = data['notes']
+            st.session_state.logs = data['logs']
+            sync_timer(*(store.running or (None, None)))
+            st.session_state.synced_at = time.monotonic()
         else:
-            st.session_state.activities = {
-                'gym': {'name': '🏋 Gym', 'duration': None, 'color': '#4a90e2'},
-                'study': {'name': '📚 Study', 'duration': None, 'color': '#00cec9'},
-                'shower': {'name': '🚿 Shower', 'duration': None, 'color': '#fd79a8'},
-                'cycle': {'name': '🚴 Leisure', 'duration': 3*3600, 'color': '#fdcb6e'},
-                'course': {'name': '💻 Course', 'duration': 2*3600, 'color': '#6c5ce7'}
-            }
-        
-        if os.path.exists('data/reminders.json'):
-            with open('data/reminders.json', 'r') as f:
-                st.session_state.reminders = json.load(f)
-        
-        if os.path.exists('data/calendar_events.json'):
-            with open('data/calendar_events.json', 'r') as f:
-                st.session_state.calendar_events = json.load(f)
-        
-        if os.path.exists('data/notes.json'):
-            with open('data/notes.json', 'r') as f:
-                st.session_state.notes = json.load(f)
-        
-        if os.path.exists('data/logs.json'):
-            with open('data/logs.json', 'r') as f:
-                st.session_state.logs = json.load(f)
-                
+            for delta in deltas:
+                if delta['kind'] == 'timer':
+                    sync_timer(delta['activity'], delta['start'])
+                else:
+                    st.session_state[delta['collection']] = store.cached(delta['collection'])
+                st.session_state.feed_version = delta['version']
+        if store.write_error():
+            st.error(f"Save error: {str(store.write_error())}. Retrying in the background.")
     except Exception as e:
         st.error(f"Data error: {str(e)}")
 
-def save_data():
+def save_record(collection, record_id, record):
+    try:
+        current_store().put(collection, record_id, record)
+    except Exception as e:
+        st.error(f"Save error: {str(e)}")
+
+def delete_record(collection, record_id):
     try:
-        with open('data/activities.json', 'w') as f:
-            json.dump(st.session_state.activities, f)
-        with open('data/reminders.json', 'w') as f:
-            json.dump(st.session_state.reminders, f, default=str)
-        with open('data/calendar_events.json', 'w') as f:
-            json.dump(st.session_state.calendar_events, f, default=str)
-        with open('data/notes.json', 'w') as f:
-            json.dump(st.session_state.notes, f)
-        with open('data/logs.json', 'w') as f:
-            json.dump(st.session_state.logs, f)
+        current_store().delete(collection, record_id)
     except Exception as e:
         st.error(f"Save error: {str(e)}")
 
-def format_duration(seconds):
-    hours, rem = divmod(seconds, 3600)
-    minutes, seconds = divmod(rem, 60)
-    return f"{int(hours):02d}h {int(minutes):02d}m {int(seconds):02d}s"
+def append_log(log_entry):
+    try:
+        current_store().append_log(log_entry)
+    except Exception as e:
+        st.error(f"Save error: {str(e)}")
 
+def save_notebook(notebook, content):
+    # The editor remembers which revision it started from, so a save made
+    # elsewhere in the meantime is reported instead of silently overwritten
+    base_key = f"editor_base_{notebook['id']}"
+    try:
+        st.session_state[base_key] = current_store().save_note(
+            notebook, content, st.session_state.get(base_key)
+        )
+        return True
+    except ConflictError as e:
+        st.error(f"{str(e)}. Reload it before saving again.")
+    except Exception as e:
+        st.error(f"Save error: {str(e)}")
+    return False
+
+def reload_notebook(notebook_id):
+    st.session_state.pop(f"editor_{notebook_id}", None)
+    st.session_state.pop(f"editor_base_{notebook_id}", None)
+
+def delete_notebook(notebook_id):
+    try:
+        current_store().delete_note(notebook_id)
+    except Exception as e:
+        st.error(f"Save error: {str(e)}")
+
+def restore_revision(notebook, rev):
+    content = current_store().note_revision(notebook['id'], rev)
+    if save_notebook(notebook, content):
+        st.session_state[f"editor_{notebook['id']}"] = content
+
+@profiled('phase')
 def get_today_summary():
     today = datetime.now().strftime("%Y-%m-%d")
     summary = {key: {'total': 0, 'completed': False} for key in st.session_state.activities}
     
-    for log in st.session_state.logs:
-        if log['date'] == today:
-            for key, act in st.session_state.activities.items():
-                if act['name'] == log['activity']:
-                    summary[key]['total'] += log['duration']
-                    if log['completed']:
-                        summary[key]['completed'] = True
+    for key, totals in current_store().rollup().day(today).items():
+        if key in summary:
+            summary[key]['total'] += totals['total']
+            if totals['completed']:
+                summary[key]['completed'] = True
     
     if st.session_state.current_activity:
         current_key = st.session_state.current_activity
@@ -230,6 +186,38 @@ def get_today_summary():
     
     return summary
 
+def show_period_progress(summary):
+    # Range totals come from the prefix-sum index; today's come from the summary
+    # so the running timer counts too
+    totals = current_store().range_totals()
+    today = date.today()
+    yesterday = today - timedelta(days=1)
+    week_start = today - timedelta(days=today.weekday())
+    month_start = today.replace(day=1)
+    days_in_month = calendar.monthrange(today.year, today.month)[1]
+    
+    st.markdown("## 📆 Week & Month")
+    for key, activity in st.session_state.activities.items():
+        if not activity['duration']:
+            continue
+        week = int(totals.total(key, week_start, yesterday) + summary[key]['total'])
+        month = int(totals.total(key, month_start, yesterday) + summary[key]['total'])
+        st.markdown(progress_html(f"{activity['name']} · this week", activity['color'], week, activity['duration'] * 7),
+                  unsafe_allow_html=True)
+        st.markdown(progress_html(f"{activity['name']} · this month", activity['color'], month,
+                                  activity['duration'] * days_in_month),
+                  unsafe_allow_html=True)
+    
+    st.markdown("## 🔥 Streaks")
+    if not st.session_state.activities:
+        return
+    cols = st.columns(len(st.session_state.activities))
+    for i, (key, activity) in enumerate(st.session_state.activities.items()):
+        # A streak still counts until today ends without any time logged
+        streak = totals.streak(key, today) or totals.streak(key, yesterday)
+        with cols[i]:
+            st.metric(activity['name'], f"{streak} day{'s' if streak != 1 else ''}")
+
 def show_dashboard():
     st.markdown("## 📊 Today's Progress Dashboard")
     summary = get_today_summary()
@@ -251,12 +239,11 @@ def show_dashboard():
                     duration = target * 3600 if target_unit == "Hours" else target * 60
                     duration = duration if target_unit != "None" and target > 0 else None
                     
-                    st.session_state.activities[key] = {
+                    save_record('activities', key, {
                         'name': f"{emoji} {name}",
                         'duration': duration,
                         'color': color
-                    }
-                    save_data()
+                    })
                     st.rerun()
                 else:
                     st.error("Please provide both emoji and activity name")
@@ -268,18 +255,13 @@ def show_dashboard():
             col1, col2 = st.columns([4, 1])
             with col1:
                 duration_info = format_duration(activity['duration']) if activity['duration'] else "No target duration"
-                st.markdown(f"""
-                    <div style="padding: 0.5rem 0; border-bottom: 1px solid #eee;">
-                        <div style="font-weight: 500; color: {activity['color']}">{activity['name']}</div>
-                        <div style="font-size: 0.8rem; color: #666">{duration_info}</div>
-                    </div>
-                """, unsafe_allow_html=True)
+                st.markdown(activity_row_html(activity['name'], activity['color'], duration_info),
+                          unsafe_allow_html=True)
             with col2:
                 if st.button("Delete", key=f"delete_{key}"):
                     if st.session_state.current_activity == key:
                         stop_activity()
-                    del st.session_state.activities[key]
-                    save_data()
+                    delete_record('activities', key)
                     st.rerun()
         if not st.session_state.activities:
             st.info("No activities to manage")
@@ -288,58 +270,98 @@ def show_dashboard():
     for key in st.session_state.activities:
         activity = st.session_state.activities[key]
         if activity['duration']:
-            total = summary[key]['total']
-            duration = activity['duration']
-            progress = min(total / duration, 1.0)
-            st.markdown(f"""
-            <div class="progress-container">
-                <div style="color: {activity['color']}; margin-bottom: 0.5rem; font-size: 1rem">
-                    {activity['name']}
-                </div>
-                <div style="display: flex; align-items: center; gap: 1rem;">
-                    <div style="flex-grow: 1; background: #f0f0f0; border-radius: 4px;">
-                        <div style="width: {progress*100}%; 
-                                  background-color: {activity['color']}; 
-                                  height: 12px; 
-                                  border-radius: 4px;
-                                  transition: width 0.3s ease;">
-                        </div>
-                    </div>
-                    <div style="font-size: 0.9rem; color: #666;">
-                        {format_duration(total)} / {format_duration(duration)}
-                    </div>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
+            total = int(summary[key]['total'])
+            st.markdown(progress_html(activity['name'], activity['color'], total, activity['duration']),
+                      unsafe_allow_html=True)
+    
+    show_period_progress(summary)
     
     st.markdown("## 🕒 Activity Cards")
     cols = st.columns(len(st.session_state.activities))
     for i, key in enumerate(st.session_state.activities):
         activity = st.session_state.activities[key]
         with cols[i]:
-            total_time = summary[key]['total']
-            st.markdown(f"""
-            <div class='compact-card' style='border-color: {activity['color']}'>
-                <div>
-                    <h4 style='margin: 0; color: {activity['color']}; font-size: 1.1rem'>{activity['name']}</h4>
-                    <div style='margin: 0.5rem 0'>
-                        <div style='font-size: 0.9rem; color: #666'>Total Time</div>
-                        <div style='font-size: 1rem; font-weight: 500'>{format_duration(total_time)}</div>
-                    </div>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
+            total_time = int(summary[key]['total'])
+            st.markdown(activity_card_html(activity['name'], activity['color'], total_time),
+                      unsafe_allow_html=True)
+
+SEARCH_ICONS = {'note': '📝', 'reminder': '🔔', 'event': '📅'}
+
+def open_notebook(notebook_id):
+    st.session_state.selected_notebook = notebook_id
+    st.session_state.active_section = "Notes"
+
+@profiled('phase')
+def search_box():
+    query = st.text_input(
+        "Search",
+        key="search_query",
+        placeholder="🔍 Search notes, reminders and events",
+        label_visibility="collapsed"
+    )
+    if not query:
+        return
+    results = current_store().search(query)
+    if not results:
+        st.info("No matches found")
+        return
+    for doc in results:
+        col1, col2 = st.columns([4, 1])
+        with col1:
+            st.markdown(f"{SEARCH_ICONS[doc['kind']]} **{doc['title']}** {doc['snippet']}")
+        with col2:
+            if doc['kind'] == 'note':
+                st.button("Open", key=f"search_open_{doc['id']}", on_click=open_notebook, args=(doc['id'],))
+    st.markdown("---")
+
+@profiled('phase')
+def show_reminder_notifications():
+    scheduler = get_scheduler(current_store())
+    if st.session_state.seen_reminder_seq is None:
+        st.session_state.seen_reminder_seq = scheduler.last_seq
+    elif st.session_state.seen_reminder_seq > scheduler.last_seq:
+        # The store was closed while idle and its scheduler started over
+        st.session_state.seen_reminder_seq = 0
+    for seq, reminder in scheduler.notifications_since(st.session_state.seen_reminder_seq):
+        st.toast(f"⏰ {reminder['text']}", icon="🔔")
+        st.session_state.seen_reminder_seq = seq
+    return scheduler.next_due()
 
+@profiled('phase')
 def show_corner_timer():
+    # The browser counts up from the start time, so the server does not
+    # have to rerun every second just to redraw this text.
+    if st.session_state.current_activity:
+        activity = st.session_state.activities[st.session_state.current_activity]
+        start_ms = int(st.session_state.start_time.timestamp() * 1000)
+        components.html(f"""
+        <script>
+            const start = {start_ms};
+            const label = {json.dumps(activity['name'])};
+            let doc = document;
+            try {{ doc = window.parent.document; }} catch (e) {{}}
+            const timer = doc.createElement('div');
+            timer.className = 'corner-timer';
+            doc.body.appendChild(timer);
+            window.addEventListener('pagehide', () => timer.remove());
+            const pad = n => String(n).padStart(2, '0');
+            function tick() {{
+                const s = Math.max(0, Math.floor((Date.now() - start) / 1000));
+                timer.textContent = `⏱ ${{label}} - ${{pad(Math.floor(s / 3600))}}h ${{pad(Math.floor(s % 3600 / 60))}}m ${{pad(s % 60)}}s`;
+            }}
+            tick();
+            setInterval(tick, 1000);
+        </script>
+        """, height=0)
+
+def target_reached_at():
     if st.session_state.current_activity:
-        elapsed = (datetime.now() - st.session_state.start_time).total_seconds()
         activity = st.session_state.activities[st.session_state.current_activity]
-        timer_text = f"⏱ {activity['name']} - {format_duration(elapsed)}"
-        st.markdown(f"""
-        <div class="corner-timer">
-            {timer_text}
-        </div>
-        """, unsafe_allow_html=True)
+        if activity['duration']:
+            reached = st.session_state.start_time + timedelta(seconds=activity['duration'])
+            if reached > datetime.now():
+                return reached
+    return None
 
 def activity_controls():
     st.markdown("## 🎯 Start Activity")
@@ -363,27 +385,85 @@ def start_activity(key):
     stop_activity()
     st.session_state.current_activity = key
     st.session_state.start_time = datetime.now()
-    save_data()
+    # The running activity is shared, so other sessions show the timer too
+    current_store().start_timer(key, st.session_state.start_time)
 
 def stop_activity():
     if st.session_state.current_activity:
-        key = st.session_state.current_activity
-        duration = (datetime.now() - st.session_state.start_time).total_seconds()
-        activity = st.session_state.activities[key]
-        completed = activity['duration'] and duration >= activity['duration']
-        
-        log_entry = {
-            'activity': activity['name'],
-            'date': datetime.now().strftime("%Y-%m-%d"),
-            'start_time': st.session_state.start_time.isoformat(),
-            'duration': duration,
-            'completed': completed
-        }
-        st.session_state.logs.append(log_entry)
         st.session_state.current_activity = None
-        save_data()
+        # Only the session that actually stops it logs the session
+        running = current_store().stop_timer()
+        if running and running[0] in st.session_state.activities:
+            key, start_time = running
+            duration = (datetime.now() - start_time).total_seconds()
+            activity = st.session_state.activities[key]
+            completed = activity['duration'] and duration >= activity['duration']
+            
+            log_entry = {
+                'activity_id': key,
+                'activity': activity['name'],
+                'date': datetime.now().strftime("%Y-%m-%d"),
+                'start_time': start_time.isoformat(),
+                'duration': duration,
+                'completed': completed
+            }
+            append_log(log_entry)
         st.rerun()
 
+def turn_page(key, step):
+    st.session_state[key] = st.session_state.get(key, 0) + step
+
+def pager(key, total, page_size=PAGE_SIZE):
+    # Returns the offset of the page to show; the page number lives in session
+    # state and the buttons change it in callbacks, before this rerun draws them
+    pages = max((total + page_size - 1) // page_size, 1)
+    page = max(0, min(st.session_state.get(key, 0), pages - 1))
+    st.session_state[key] = page
+    if pages > 1:
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            st.button("◀ Prev", key=f"{key}_prev", disabled=page == 0,
+                      on_click=turn_page, args=(key, -1))
+        with col3:
+            st.button("Next ▶", key=f"{key}_next", disabled=page == pages - 1,
+                      on_click=turn_page, args=(key, 1))
+        with col2:
+            st.caption(f"Page {page + 1} of {pages} · {total} items")
+    return page * page_size
+
+def repeat_input(key, start_date):
+    # Only the rule is stored; occurrences are worked out when displayed
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        repeat = st.selectbox("Repeat", ["Never", "Daily", "Weekly", "Monthly"], key=f"{key}_repeat")
+    with col2:
+        interval = st.number_input("Every", min_value=1, value=1, key=f"{key}_interval")
+    with col3:
+        ends = st.selectbox("Ends", ["Never", "On date", "After"], key=f"{key}_ends")
+    weekdays = st.multiselect("On days (weekly)", range(7), default=[start_date.weekday()],
+                              format_func=lambda day: WEEKDAYS[day], key=f"{key}_weekdays")
+    col1, col2 = st.columns(2)
+    with col1:
+        until = st.date_input("End date", value=start_date + timedelta(days=30), key=f"{key}_until")
+    with col2:
+        count = st.number_input("Occurrences", min_value=1, value=10, key=f"{key}_count")
+    if repeat == "Never":
+        return None
+    rule = {'freq': repeat.lower(), 'interval': interval}
+    if rule['freq'] == 'weekly':
+        rule['weekdays'] = weekdays
+    if ends == "On date":
+        rule['until'] = until.isoformat()
+    elif ends == "After":
+        rule['count'] = count
+    return validate_rule(rule)
+
+def skip_occurrence(collection, record, day):
+    rule = dict(record.repeat)
+    rule['except'] = list(rule.get('except', ())) + [day.isoformat()]
+    save_record(collection, record['id'], {**record.to_dict(), 'repeat': validate_rule(rule)})
+
+@profiled('tab')
 def reminders_tab():
     st.header("🔔 Reminders Manager")
     with st.expander("➕ Add New Reminder", expanded=True):
@@ -393,80 +473,81 @@ def reminders_tab():
             due_date = st.date_input("Due date")
         with col2:
             due_time = st.time_input("Due time")
+        repeat = repeat_input("reminder", due_date)
         
         if st.button("Add Reminder") and new_reminder:
             reminder_id = str(uuid.uuid4())
-            st.session_state.reminders.append({
+            reminder = {
                 'id': reminder_id,
                 'text': new_reminder,
                 'due': datetime.combine(due_date, due_time).isoformat(),
                 'completed': False
-            })
-            save_data()
+            }
+            if repeat:
+                reminder['repeat'] = repeat
+            save_record('reminders', reminder_id, reminder)
             st.rerun()
     
-    st.subheader("Active Reminders")
+    st.subheader("Reminders")
     if not st.session_state.reminders:
         st.info("No reminders added yet!")
         return
     
-    for reminder in st.session_state.reminders:
-        due_date = datetime.fromisoformat(reminder['due'])
-        is_overdue = datetime.now() > due_date if not reminder['completed'] else False
+    queue = current_store().reminder_queue()
+    status = st.radio(
+        "Show",
+        queue.STATUSES,
+        horizontal=True,
+        key="reminder_status",
+        format_func=lambda s: f"{s.title()} ({queue.count(s)})"
+    )
+    offset = pager(f"reminder_page_{status}", queue.count(status))
+    for reminder in queue.page(status, offset, PAGE_SIZE):
+        # Repeating reminders show their next occurrence
+        due_date = queue.due.get(reminder['id'], reminder.due)
+        is_overdue = queue.is_overdue(reminder['id'])
         
         col1, col2 = st.columns([4, 1])
         with col1:
-            st.markdown(f"""
-            <div style="background: #f8f9fa; padding: 1rem; border-radius: 8px; margin: 0.5rem 0;
-                        border-left: 4px solid {'#ef4444' if is_overdue else '#4a90e2'}">
-                <div style="{'color: #ef4444' if is_overdue else 'color: #2d3436'}">
-                    {reminder['text']}
-                </div>
-                <div style="color: #666; font-size: 0.9rem">
-                    ⏰ Due: {due_date.strftime('%b %d, %Y %I:%M %p')}
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
+            due_label = due_date.strftime('%b %d, %Y %I:%M %p')
+            if reminder.repeat:
+                due_label += f" · 🔁 {describe(reminder.repeat)}"
+            st.markdown(reminder_card_html(reminder['text'], due_label, is_overdue),
+                      unsafe_allow_html=True)
         
         with col2:
+            if reminder.repeat and status == 'active' and st.button("Skip", key=f"skip_{reminder['id']}"):
+                skip_occurrence('reminders', reminder, due_date.date())
+                st.rerun()
+            if status != 'completed' and st.button("✓", key=f"done_{reminder['id']}"):
+                save_record('reminders', reminder['id'], {**reminder.to_dict(), 'completed': True})
+                st.rerun()
             if st.button("✕", key=f"del_{reminder['id']}"):
-                st.session_state.reminders.remove(reminder)
-                save_data()
+                delete_record('reminders', reminder['id'])
                 st.rerun()
 
+@profiled('tab')
 def calendar_tab():
     st.header("📅 Calendar Events")
     
     # Upcoming Events Section
     st.subheader("🗓 Next 7 Days' Events")
     today = datetime.today().date()
-    upcoming_events = sorted(
-        [e for e in st.session_state.calendar_events 
-         if datetime.fromisoformat(e['due']).date() >= today],
-        key=lambda x: datetime.fromisoformat(x['due'])
-    )[:7]
+    event_index = current_store().event_index()
+    upcoming_events = event_index.upcoming(today, 7)
 
     if upcoming_events:
         cols = st.columns(7)
-        for i, event in enumerate(upcoming_events):
+        for i, (due, event) in enumerate(upcoming_events):
             with cols[i % 7]:
-                event_date = datetime.fromisoformat(event['due']).date()
-                event_time = datetime.fromisoformat(event['due']).strftime("%I:%M %p")
+                event_date = due.date()
+                event_time = due.strftime("%I:%M %p")
                 days_until = (event_date - today).days
                 
-                st.markdown(f"""
-                    <div style="padding: 0.5rem; margin: 0.25rem 0; 
-                                background: {event.get('color', '#f8f9fa')};
-                                border-radius: 8px; text-align: center;">
-                        <div style="font-size: 1.1rem; font-weight: 500;">{event_date.day}</div>
-                        <div style="font-size: 0.8rem;">{event_date.strftime('%a')}</div>
-                        <div style="font-size: 0.9rem; margin-top: 0.5rem;">{event['text'][:15]}{'...' if len(event['text']) >15 else ''}</div>
-                        <div style="color: #666; font-size: 0.8rem">
-                            {event_time}<br>
-                            {days_until}d
-                        </div>
-                    </div>
-                """, unsafe_allow_html=True)
+                st.markdown(upcoming_event_html(
+                    event_date.day, event_date.strftime('%a'), event['text'],
+                    event.get('color', '#f8f9fa'), event_time, days_until
+                ), unsafe_allow_html=True)
         st.markdown("---")
     else:
         st.info("No upcoming events in the next 7 days")
@@ -492,56 +573,44 @@ def calendar_tab():
         st.session_state.calendar_view.month
     )
     
+    # Repeating events are expanded once for the whole grid
+    month_counts = event_index.counts(month_days[0][0], month_days[-1][-1])
     for week in month_days:
         cols = st.columns(7)
         for i, day in enumerate(week):
             with cols[i]:
-                day_events = [e for e in st.session_state.calendar_events 
-                            if datetime.fromisoformat(e['due']).date() == day]
-                is_today = day == date.today()
+                event_count = month_counts.get(day, 0)
                 is_current_month = day.month == st.session_state.calendar_view.month
                 
-                btn_label = f"{day.day}\n{len(day_events)*'•'}"
+                btn_label = f"{day.day}\n{event_count*'•'}"
                 if st.button(btn_label, 
                            key=f"day_{day}",
                            disabled=not is_current_month):
                     st.session_state.selected_date = day
-                
-                st.markdown(f"""
-                    <style>
-                        button[data-testid="baseButton-secondary"][disabled] {{
-                            background-color: {'#e3f2fd' if is_today else '#f8f9fa'} !important;
-                            border-color: {'#2196f3' if is_today else '#dee2e6'} !important;
-                            color: {'#000' if is_current_month else '#9e9e9e'} !important;
-                        }}
-                    </style>
-                """, unsafe_allow_html=True)
     
     # Date-Specific Event Management
     if st.session_state.get('selected_date'):
         selected_date = st.session_state.selected_date
         st.subheader(f"🗓 {selected_date.strftime('%b %d, %Y')} Events")
         
-        date_events = [e for e in st.session_state.calendar_events 
-                      if datetime.fromisoformat(e['due']).date() == selected_date]
+        offset = pager(f"day_page_{selected_date}", event_index.count(selected_date))
+        date_events = event_index.page(selected_date, selected_date, offset, PAGE_SIZE)[0]
         
         if date_events:
-            for event in date_events:
+            for due, event in date_events:
                 col1, col2 = st.columns([4, 1])
                 with col1:
-                    due_time = datetime.fromisoformat(event['due']).strftime("%I:%M %p")
-                    st.markdown(f"""
-                        <div class="reminder-item" style="border-color: {event.get('color', '#4a90e2')}">
-                            <div style="font-weight: 500;">{event['text']}</div>
-                            <div style="color: #666; font-size: 0.9rem">
-                                ⏰ {due_time} • {event.get('color', '#4a90e2')}
-                            </div>
-                        </div>
-                    """, unsafe_allow_html=True)
+                    due_time = due.strftime("%I:%M %p")
+                    if event.repeat:
+                        due_time += f" · 🔁 {describe(event.repeat)}"
+                    st.markdown(day_event_html(event['text'], event.get('color', '#4a90e2'), due_time),
+                              unsafe_allow_html=True)
                 with col2:
+                    if event.repeat and st.button("Skip", key=f"cal_skip_{event['id']}"):
+                        skip_occurrence('calendar_events', event, selected_date)
+                        st.rerun()
                     if st.button("✕", key=f"cal_del_{event['id']}"):
-                        st.session_state.calendar_events.remove(event)
-                        save_data()
+                        delete_record('calendar_events', event['id'])
                         st.rerun()
         else:
             st.info("No events for this date")
@@ -551,81 +620,47 @@ def calendar_tab():
             event_text = st.text_input("Event description")
             event_time = st.time_input("Event time")
             event_color = st.color_picker("Event color", value="#ff6b6b")
+            repeat = repeat_input("event", selected_date)
             
             if st.form_submit_button("➕ Add Event"):
                 if event_text:
                     event_id = str(uuid.uuid4())
                     due_datetime = datetime.combine(selected_date, event_time)
-                    st.session_state.calendar_events.append({
+                    event = {
                         'id': event_id,
                         'text': event_text,
                         'due': due_datetime.isoformat(),
                         'color': event_color
-                    })
-                    save_data()
+                    }
+                    if repeat:
+                        event['repeat'] = repeat
+                    save_record('calendar_events', event_id, event)
                     st.rerun()
                 else:
                     st.error("Event description cannot be empty")
+    
+    # Events over a date range, one page at a time
+    with st.expander("📋 Events by Date Range", expanded=False):
+        view = st.session_state.calendar_view
+        col1, col2 = st.columns(2)
+        with col1:
+            range_start = st.date_input("From", value=view, key="events_from")
+        with col2:
+            last_day = calendar.monthrange(view.year, view.month)[1]
+            range_end = st.date_input("To", value=view.replace(day=last_day), key="events_to")
+        total = event_index.page(range_start, range_end, 0, 0)[1]
+        offset = pager(f"range_page_{range_start}_{range_end}", total)
+        for due, event in event_index.page(range_start, range_end, offset, PAGE_SIZE)[0]:
+            st.markdown(day_event_html(event['text'], event.get('color', '#4a90e2'),
+                                       due.strftime("%b %d, %Y %I:%M %p")),
+                      unsafe_allow_html=True)
+        if not total:
+            st.info("No events in this date range")
 
+@profiled('tab')
 def notes_tab():
     st.header("📝 Notes Notebooks")
     
-    # Custom CSS for Notes Tab
-    st.markdown("""
-    <style>
-        .notebook-card {
-            padding: 1rem;
-            margin: 0.5rem 0;
-            border: 2px solid #4a90e2;
-            border-radius: 10px;
-            background: white;
-            transition: transform 0.2s;
-        }
-        .notebook-card:hover {
-            transform: translateY(-2px);
-            box-shadow: 0 2px 8px rgba(74, 144, 226, 0.2);
-        }
-        .editor-container {
-            border: 2px solid #4a90e2;
-            border-radius: 10px;
-            padding: 1.5rem;
-            margin: 1rem 0;
-            background: #2d3436;
-        }
-        .editor-container textarea {
-            background-color: #2d3436 !important;
-            color: white !important;
-            border: 1px solid #4a90e2 !important;
-            border-radius: 8px !important;
-            padding: 1rem !important;
-            font-family: 'Inter', sans-serif !important;
-            font-size: 16px !important;
-        }
-        .preview-container {
-            border: 2px solid #4a90e2;
-            border-radius: 10px;
-            padding: 1.5rem;
-            margin: 1rem 0;
-            background: #f8f9fa;
-            color: #2d3436;
-        }
-        .formatting-help {
-            color: #ffffff;
-            background: #404040;
-            padding: 1rem;
-            border-radius: 8px;
-            margin: 1rem 0;
-        }
-        .save-button {
-            background: #4a90e2 !important;
-            color: white !important;
-            border: none !important;
-            padding: 0.5rem 1.5rem !important;
-            border-radius: 8px !important;
-        }
-    </style>
-    """, unsafe_allow_html=True)
-
     # Create New Notebook
     with st.expander("➕ Create New Notebook", expanded=False):
         with st.form("new_notebook_form"):
@@ -640,11 +675,10 @@ def notes_tab():
                         'id': str(uuid.uuid4()),
                         'name': name,
                         'color': color,
-                        'content': "",
+                        'preview': "",
                         'created': datetime.now().isoformat()
                     }
-                    st.session_state.notes.append(new_notebook)
-                    save_data()
+                    save_record('notes', new_notebook['id'], new_notebook)
                     st.session_state.selected_notebook = new_notebook['id']
                     st.rerun()
                 else:
@@ -653,22 +687,17 @@ def notes_tab():
     # Notebooks Grid View
     if st.session_state.notes:
         st.subheader("Your Notebooks")
+        notebooks = current_store().notebook_index()
+        name_filter = st.text_input("Filter by name", key="notebook_filter",
+                                    placeholder="Notebook name starts with...").strip()
+        offset = pager(f"notebook_page_{name_filter}", notebooks.count(name_filter), NOTEBOOK_PAGE_SIZE)
         cols = st.columns(3)
-        for idx, notebook in enumerate(st.session_state.notes):
+        for idx, notebook in enumerate(notebooks.page(name_filter, offset, NOTEBOOK_PAGE_SIZE)):
             with cols[idx % 3]:
                 with st.container():
-                    st.markdown(f"""
-                    <div class="notebook-card" style="border-left: 4px solid {notebook['color']}">
-                        <div style="display: flex; justify-content: space-between; align-items: center;">
-                            <h3 style="margin: 0; color: {notebook['color']}">{notebook['name']}</h3>
-                            <button onclick="window.confirmDelete('{notebook['id']}')" 
-                                    style="border: none; background: none; color: #ff4444;">✕</button>
-                        </div>
-                        <div style="color: #666; font-size: 0.9em; margin-top: 0.5rem;">
-                            {notebook['content'][:50] + '...' if notebook['content'] else 'Empty notebook'}
-                        </div>
-                    </div>
-                    """, unsafe_allow_html=True)
+                    preview = notebook['preview'] + '...' if notebook['preview'] else 'Empty notebook'
+                    st.markdown(notebook_card_html(notebook['id'], notebook['name'], notebook['color'], preview),
+                              unsafe_allow_html=True)
                     
                     if st.button("Open", key=f"open_{notebook['id']}"):
                         st.session_state.selected_notebook = notebook['id']
@@ -677,8 +706,16 @@ def notes_tab():
         st.markdown("---")
         
     # Notebook Editor
+    notebook = None
     if st.session_state.selected_notebook:
-        notebook = next(n for n in st.session_state.notes if n['id'] == st.session_state.selected_notebook)
+        notebook = current_store().notebook_index().notes.get(st.session_state.selected_notebook)
+    if notebook:
+        # The editor is driven only through session state, so restoring a
+        # revision can replace its text without a conflicting value=
+        editor_key = f"editor_{notebook['id']}"
+        if editor_key not in st.session_state:
+            st.session_state[editor_key] = current_store().note_body(notebook['id'])
+        st.session_state.setdefault(f"editor_base_{notebook['id']}", notebook.get('revision', 0))
         
         with st.container():
             st.markdown(f"### ✏ Editing: {notebook['name']}")
@@ -697,9 +734,8 @@ def notes_tab():
             with st.container():
                 new_content = st.text_area(
                     "Edit your notes:",
-                    value=notebook['content'],
                     height=400,
-                    key=f"editor_{notebook['id']}",
+                    key=editor_key,
                     label_visibility="collapsed"
                 )
             
@@ -710,9 +746,13 @@ def notes_tab():
                            key=f"save_{notebook['id']}", 
                            use_container_width=True,
                            type="primary"):
-                    notebook['content'] = new_content
-                    save_data()
-                    st.toast("Changes saved successfully!", icon="✅")
+                    if save_notebook(notebook, new_content):
+                        st.toast("Changes saved successfully!", icon="✅")
+                    else:
+                        st.button("🔄 Reload Notebook",
+                                  key=f"reload_{notebook['id']}",
+                                  on_click=reload_notebook,
+                                  args=(notebook['id'],))
             
             # Preview
             st.markdown("### 📄 Preview")
@@ -720,14 +760,36 @@ def notes_tab():
                 st.markdown(f'<div class="preview-container">{new_content}</div>', 
                           unsafe_allow_html=True)
             
+            # Revision History
+            if st.checkbox("🕘 Show revision history", key=f"history_{notebook['id']}"):
+                revisions = current_store().note_revisions(notebook['id'])
+                if revisions:
+                    labels = {
+                        r['rev']: f"#{r['rev']} • {datetime.fromisoformat(r['saved']).strftime('%b %d, %Y %I:%M %p')} • {r['size']} chars"
+                        for r in revisions
+                    }
+                    rev = st.selectbox("Revision", list(labels), format_func=labels.get, key=f"rev_{notebook['id']}")
+                    st.text_area(
+                        "Revision content",
+                        value=current_store().note_revision(notebook['id'], rev),
+                        height=200,
+                        disabled=True,
+                        key=f"rev_text_{notebook['id']}_{rev}"
+                    )
+                    st.button("↩ Restore This Revision",
+                              key=f"restore_{notebook['id']}",
+                              on_click=restore_revision,
+                              args=(notebook, rev))
+                else:
+                    st.info("No saved revisions yet")
+            
             # Delete Button
             st.markdown("---")
             if st.button("🗑 Delete This Notebook", 
                         type="primary", 
                         key=f"del_{notebook['id']}",
                         use_container_width=True):
-                st.session_state.notes.remove(notebook)
-                save_data()
+                delete_notebook(notebook['id'])
                 st.session_state.selected_notebook = None
                 st.rerun()
     else:
@@ -744,50 +806,134 @@ def notes_tab():
     </script>
     """, unsafe_allow_html=True)
 
+@profiled('tab')
+def reports_tab():
+    st.header("📈 History & Reports")
+    frame = get_log_frame(st.session_state.logs, st.session_state.activities, st.session_state.namespace)
+    if frame.empty:
+        st.info("No activity history yet!")
+        return
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        period = st.selectbox("Group by", list(FREQUENCIES), key="report_period")
+    with col2:
+        start = st.date_input("From", value=frame['date'].min().date(), key="report_start")
+    with col3:
+        end = st.date_input("To", value=frame['date'].max().date(), key="report_end")
+    
+    names = {key: act['name'] for key, act in st.session_state.activities.items()}
+    
+    st.subheader("🗓 Year Heatmap")
+    options = [None] + list(st.session_state.activities)
+    choice = st.selectbox("Activity", options, key="heatmap_activity",
+                          format_func=lambda key: "All activities" if key is None else names[key])
+    year_end = date.today()
+    year_start = year_end - timedelta(days=364)
+    daily = current_store().range_totals().daily(choice, year_start, year_end)
+    color = '#4a90e2' if choice is None else st.session_state.activities[choice]['color']
+    st.markdown(heatmap_html(year_start, daily, color), unsafe_allow_html=True)
+    st.caption(f"{format_duration(sum(daily))} over the last year")
+    
+    totals = activity_totals(frame, FREQUENCIES[period], start, end)
+    if totals.empty:
+        st.info("No sessions in this date range")
+        return
+    
+    st.subheader("⏱ Time per Activity (hours)")
+    hours = (totals / 3600).rename(columns=names)
+    st.bar_chart(hours)
+    st.dataframe(hours.round(2), use_container_width=True)
+    
+    st.subheader("🎯 Target Hit Rate (%)")
+    rates = target_hit_rates(frame, st.session_state.activities, FREQUENCIES[period], start, end)
+    if rates.empty:
+        st.info("No activities with a target duration in this range")
+    else:
+        st.dataframe((rates * 100).round(0).rename(columns=names), use_container_width=True)
+
+@profiled('tab')
 def reset_tab():
     st.header("🔄 Reset Data")
     st.warning("This action will permanently delete all your data!")
     if st.button("⚠ Reset All Data"):
         try:
-            os.remove('data/logs.json')
-            os.remove('data/reminders.json')
-            os.remove('data/activities.json')
-            os.remove('data/calendar_events.json')
-            os.remove('data/notes.json')
-        except:
-            pass
+            current_store().clear()
+        except Exception as e:
+            st.error(f"Reset error: {str(e)}")
         st.session_state.clear()
         st.rerun()
 
+@profiled('tab')
+def dashboard_tab():
+    show_dashboard()
+    activity_controls()
+
+SECTIONS = {
+    "Dashboard & Activities": dashboard_tab,
+    "Reminders": reminders_tab,
+    "Calendar Events": calendar_tab,
+    "Notes": notes_tab,
+    "History & Reports": reports_tab,
+    "Reset Data": reset_tab
+}
+
+def show_profile_panel(started):
+    # Where this rerun's time went; only shown with PRODUCTIVITY_PROFILE=1
+    total = time.perf_counter() - started
+    metrics.registry.observe('phase', 'script', total)
+    run = metrics.registry.current_run()
+    with st.expander("🛠 Profiling", expanded=False):
+        st.caption(
+            f"Rerun took {total * 1000:.1f} ms · storage read {run['bytes']['read']:,} bytes, "
+            f"wrote {run['bytes']['written']:,} bytes"
+        )
+        rows = [
+            {'kind': kind, 'name': name, 'calls': count, 'ms': round(seconds * 1000, 2)}
+            for (kind, name), (count, seconds) in sorted(run['timings'].items(), key=lambda item: -item[1][1])
+        ]
+        st.dataframe(rows, use_container_width=True, hide_index=True)
+    metrics.registry.write()
+    metrics.serve()
+
 def main():
+    started = time.perf_counter()
+    if metrics.ENABLED:
+        metrics.registry.start_run()
     init_session_state()
+    st.session_state.namespace = resolve_namespace()
+    inject_css()
     load_data()
     
     st.title("Productivity Master")
     show_corner_timer()
-    
-    tab1, tab2, tab3, tab4, tab5 = st.tabs([
-        "Dashboard & Activities", 
-        "Reminders", 
-        "Calendar Events",
-        "Notes",
-        "Reset Data"
-    ])
-    
-    with tab1:
-        show_dashboard()
-        activity_controls()
-    with tab2:
-        reminders_tab()
-    with tab3:
-        calendar_tab()
-    with tab4:
-        notes_tab()
-    with tab5:
-        reset_tab()
+    next_reminder = show_reminder_notifications()
+    search_box()
+    
+    # Only the selected section runs, unlike st.tabs which renders them all
+    section = st.radio(
+        "Section",
+        list(SECTIONS),
+        horizontal=True,
+        key="active_section",
+        label_visibility="collapsed"
+    )
+    SECTIONS[section]()
 
-    if st.session_state.current_activity:
-        st_autorefresh(interval=1000, key="timer_refresh")
+    # Rerun only when something server-side happens: a running activity
+    # reaching its target, the next reminder coming due, or, while other
+    # sessions are open and this one shows live state, a change they may
+    # publish on the feed.
+    wake_times = [t for t in (target_reached_at(), next_reminder) if t]
+    live = st.session_state.current_activity or section in LIVE_SECTIONS
+    if live and current_store().feed.watchers() > 1:
+        wake_times.append(datetime.now() + timedelta(seconds=SYNC_SECONDS - 1))
+    if wake_times:
+        delay = (min(wake_times) - datetime.now()).total_seconds() + 1
+        st_autorefresh(interval=int(min(max(delay, 1), 3600) * 1000), key="scheduled_refresh")
+
+    if metrics.ENABLED:
+        show_profile_panel(started)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,274 @@
+"""Benchmarks for loading, saving, the daily summary and tab renders.
+
+    python bench.py --output results.json
+    python bench.py --scale 0.1 --compare results.json
+
+A synthetic dataset (by default 10 activities, 500k logs, 50k calendar
+events, 10k reminders and 2k notebooks) is generated in a temporary data
+directory. Tabs are rendered through streamlit's AppTest. Results are
+written as JSON. With ``--compare`` any timing more than ``--threshold``
+times its baseline median is reported and the exit status is 1.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+from streamlit.testing.v1 import AppTest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT)
+
+from datastore import DataStore, get_store  # noqa: E402
+
+SIZES = {
+    'activities': 10,
+    'logs': 500_000,
+    'calendar_events': 50_000,
+    'reminders': 10_000,
+    'notes': 2_000,
+}
+
+WORDS = ('plan', 'review', 'call', 'gym', 'study', 'draft', 'budget', 'trip', 'read', 'ship',
+         'notes', 'meeting', 'design', 'lunch', 'course', 'report', 'garden', 'invoice')
+
+# Runs a single app.py function inside AppTest and records its own time, so
+# script start-up and AppTest bookkeeping are not counted.
+CALL_SCRIPT = '''
+import sys
+import time
+sys.path.insert(0, {root!r})
+import streamlit as st
+import app
+app.init_session_state()
+app.load_data()
+start = time.perf_counter()
+{call}
+st.session_state.bench_seconds = time.perf_counter() - start
+'''
+
+CALLS = {
+    'load_data': 'app.load_data()',
+    'get_today_summary': 'app.get_today_summary()',
+    'save_record': (
+        "app.save_record('reminders', 'bench', "
+        "{'id': 'bench', 'text': 'bench', 'due': '2030-01-01T09:00:00', 'completed': False})"
+    ),
+    'append_log': (
+        "app.append_log({'activity_id': 'act0', 'activity': 'Activity 0', "
+        "'date': time.strftime('%Y-%m-%d'), 'duration': 60.0, 'completed': False})"
+    ),
+}
+
+
+def _text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def generate(store, sizes=SIZES, seed=0, chunk=10_000):
+    """Fill ``store`` with a reproducible synthetic dataset."""
+    rng = random.Random(seed)
+    today = date.today()
+    activities = {
+        f'act{i}': {
+            'name': f'Activity {i}',
+            'duration': rng.choice((None, 1800, 3600, 2 * 3600)),
+            'color': f'#{rng.randrange(0x1000000):06x}',
+        }
+        for i in range(sizes['activities'])
+    }
+    for key, activity in activities.items():
+        store.put('activities', key, activity)
+    keys = list(activities)
+
+    # Logs run back over three years and always include some for today
+    remaining = sizes['logs']
+    while remaining:
+        batch = []
+        for _ in range(min(chunk, remaining)):
+            day = today - timedelta(days=min(int(rng.expovariate(1 / 180)), 3 * 365))
+            key = rng.choice(keys)
+            duration = float(rng.randint(60, 3 * 3600))
+            target = activities[key]['duration']
+            batch.append({
+                'activity_id': key,
+                'activity': activities[key]['name'],
+                'date': day.isoformat(),
+                'start_time': datetime.combine(day, datetime.min.time()).isoformat(),
+                'duration': duration,
+                'completed': bool(target and duration >= target),
+            })
+        batch.sort(key=lambda log: log['date'])
+        store.append_logs(batch)
+        remaining -= len(batch)
+
+    def due(span_days):
+        moment = datetime.combine(today, datetime.min.time())
+        offset = timedelta(days=rng.randint(-span_days, span_days), minutes=rng.randrange(0, 24 * 60, 15))
+        return (moment + offset).isoformat()
+
+    for name, count, make in (
+        ('calendar_events', sizes['calendar_events'], lambda: {
+            'text': _text(rng, 3), 'due': due(365), 'color': '#ff6b6b'}),
+        ('reminders', sizes['reminders'], lambda: {
+            'text': _text(rng, 4), 'due': due(60), 'completed': rng.random() < 0.3}),
+    ):
+        for start in range(0, count, chunk):
+            store.put_many(name, [
+                {'id': str(uuid.uuid4()), **make()} for _ in range(min(chunk, count - start))
+            ])
+
+    notes = []
+    for i in range(sizes['notes']):
+        content = '\n'.join(_text(rng, 12) for _ in range(rng.randint(5, 200)))
+        notebook = {
+            'id': str(uuid.uuid4()),
+            'name': f'Notebook {i} {_text(rng, 1)}',
+            'color': '#4a90e2',
+            'preview': content[:50],
+            'created': datetime.now().isoformat(),
+        }
+        store.storage.save_note_body(notebook['id'], content)
+        notes.append(notebook)
+    store.put_many('notes', notes)
+
+
+def _stats(times):
+    return {
+        'runs': len(times),
+        'min': min(times),
+        'median': statistics.median(times),
+        'max': max(times),
+    }
+
+
+def measure(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return _stats(times)
+
+
+def _run(at):
+    at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return at
+
+
+def bench_store(store, repeat):
+    results = {}
+    results['store.load_all (cold)'] = measure(
+        lambda: DataStore(type(store.storage)(data_dir=store.storage.data_dir)).load_all(), repeat
+    )
+    results['store.rollup (build)'] = measure(
+        lambda: DataStore(store.storage).rollup().day(date.today().isoformat()), repeat
+    )
+    return results
+
+
+def bench_calls(repeat, timeout):
+    results = {}
+    for name, call in CALLS.items():
+        at = AppTest.from_string(CALL_SCRIPT.format(root=ROOT, call=call), default_timeout=timeout)
+        times = []
+        for _ in range(repeat):
+            times.append(_run(at).session_state['bench_seconds'])
+        results[f'app.{name}'] = _stats(times)
+    return results
+
+
+def bench_tabs(store, repeat, timeout):
+    results = {}
+    at = AppTest.from_file(os.path.join(ROOT, 'app.py'), default_timeout=timeout)
+    results['render first run'] = measure(lambda: _run(at), 1)
+    sections = at.radio(key='active_section').options
+    for section in sections:
+        at.radio(key='active_section').set_value(section)
+        results[f'render {section}'] = measure(lambda: _run(at), repeat)
+
+    # Views that only render part of their data until something is opened
+    at.radio(key='active_section').set_value('Notes')
+    at.session_state['selected_notebook'] = store.get('notes')[0]['id']
+    results['render Notes (notebook open)'] = measure(lambda: _run(at), repeat)
+    at.radio(key='active_section').set_value('Calendar Events')
+    at.session_state['selected_date'] = date.today()
+    results['render Calendar Events (day open)'] = measure(lambda: _run(at), repeat)
+    return results
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get('results', {}).get(name)
+        if before and result['median'] > before['median'] * threshold:
+            regressions.append((name, before['median'], result['median']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', type=float, default=1.0, help="multiply every dataset size")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=600, help="AppTest run timeout in seconds")
+    parser.add_argument('--output', help="write JSON results here instead of stdout")
+    parser.add_argument('--compare', help="baseline JSON results to check against")
+    parser.add_argument('--threshold', type=float, default=1.25)
+    args = parser.parse_args(argv)
+
+    sizes = {name: max(int(count * args.scale), 1) for name, count in SIZES.items()}
+    output = args.output and os.path.abspath(args.output)
+    baseline = args.compare and os.path.abspath(args.compare)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='productivity-bench-') as workdir:
+        # storage.DATA_DIR is relative, so the app and the generator share workdir/data
+        os.chdir(workdir)
+        store = get_store()
+        started = time.perf_counter()
+        generate(store, sizes, args.seed)
+        generated = time.perf_counter() - started
+
+        results = {}
+        results.update(bench_store(store, args.repeat))
+        results.update(bench_calls(args.repeat, args.timeout))
+        results.update(bench_tabs(store, args.repeat, args.timeout))
+        os.chdir(cwd)
+
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'storage': os.environ.get('PRODUCTIVITY_STORAGE', 'sqlite'),
+        'sizes': sizes,
+        'seed': args.seed,
+        'generate_seconds': generated,
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if baseline:
+        with open(baseline, 'r') as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: {before * 1000:.1f}ms -> {after * 1000:.1f}ms", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
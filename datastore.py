@@ -0,0 +1,480 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from feed import ChangeFeed
+from indexes import DailyRollup, EventIndex, NotebookIndex, RangeTotals, ReminderQueue
+from models import to_model, to_record, to_stored
+from revisions import SNAPSHOT_EVERY, new_revision, text_at
+from search import SearchIndex
+from storage import COLLECTIONS, close_storage, get_storage
+from writer import WriteBehind
+
+# Derived indexes: the collections each is built from and its builder.
+# An index lists in ``incremental`` the collections it can follow change by
+# change; a change to any other source drops it for a lazy rebuild.
+INDEXES = {
+    'rollup': (('logs', 'activities'), DailyRollup.build),
+    'totals': (('logs', 'activities'), RangeTotals.build),
+    'events': (('calendar_events',), EventIndex.build),
+    'reminders': (('reminders',), ReminderQueue.build),
+    'notebooks': (('notes',), NotebookIndex.build),
+}
+
+# Longest a bulk operation waits for write-behind to drain before failing
+FLUSH_TIMEOUT = 10
+
+# A namespace's store, threads and connection are closed once unused this long
+IDLE_SECONDS = float(os.environ.get('PRODUCTIVITY_IDLE_SECONDS', '1800'))
+
+# Collections covered by full-text search and their document kind
+SEARCH_SOURCES = {
+    'notes': 'note',
+    'reminders': 'reminder',
+    'calendar_events': 'event',
+}
+
+
+class ConflictError(Exception):
+    """A record changed in another session since this one last read it."""
+
+
+class DataStore:
+    """Process-wide cache of parsed collections shared by every session.
+
+    Collections are held in the typed forms from models: logs as a
+    column-wise LogTable, reminders and events as slotted records with
+    parsed due times. Conversion happens only on load and on write.
+
+    Each collection is re-read only when the backend reports a new signature
+    (file mtime/size for JSON, generation counter for SQLite). Writes replace
+    the cached container instead of mutating it, so a session iterating over
+    the old one is never disturbed.
+
+    Every change is also published on ``feed`` so sessions can pick up
+    just what changed, including the running activity, which lives here
+    rather than in one session.
+
+    With ``write_behind`` a change updates the cache and returns at once
+    while a WriteBehind worker persists it; a collection with unwritten
+    changes is served from the cache. Changes inside ``batch()`` and bulk
+    operations drain the worker first and are written synchronously.
+    """
+
+    def __init__(self, storage, write_behind=False):
+        self.storage = storage
+        self._writer = WriteBehind(storage, self._written) if write_behind else None
+        self._batch_depth = 0
+        self._lock = threading.RLock()
+        self._data = {}
+        self._signatures = {}
+        self._indexes = {}
+        self._listeners = []
+        self.feed = ChangeFeed()
+        self.running = None
+        self.closed = False
+        self._search = None
+        self._search_synced = {}
+
+    def get(self, name):
+        with self._lock:
+            if name in self._data and self._writer and self._writer.has_pending(name):
+                return self._data[name]
+            signature = self.storage.signature(name)
+            if name not in self._data or self._signatures[name] != signature:
+                self._data[name] = to_model(name, self.storage.load(name))
+                self._signatures[name] = signature
+                self._invalidate(name)
+            return self._data[name]
+
+    def add_listener(self, callback):
+        """Call ``callback(name)`` whenever a collection changes or reloads.
+
+        ``callback(None)`` is called once the store is closed.
+        """
+        self._listeners.append(callback)
+
+    def _notify(self, name, op='reload', record_id=None):
+        self.feed.publish('collection', collection=name, op=op, id=record_id)
+        for callback in self._listeners:
+            callback(name)
+
+    def cached(self, name):
+        """The collection as currently cached, without checking storage for changes."""
+        with self._lock:
+            if name in self._data:
+                return self._data[name]
+            return self.get(name)
+
+    def start_timer(self, key, start_time):
+        with self._lock:
+            self.running = (key, start_time)
+            self.feed.publish('timer', activity=key, start=start_time)
+
+    def stop_timer(self):
+        """Clear the running activity and return ``(key, start_time)``.
+
+        Returns None if no activity is running, e.g. another session
+        stopped it first, so a session only logs a session it stopped.
+        """
+        with self._lock:
+            running, self.running = self.running, None
+            if running:
+                self.feed.publish('timer', activity=None, start=None)
+            return running
+
+    def _invalidate(self, name):
+        for index_name, (sources, _) in INDEXES.items():
+            if name in sources:
+                self._indexes.pop(index_name, None)
+        self._notify(name)
+
+    def _changed(self, name, method, *args):
+        for index_name, index in list(self._indexes.items()):
+            if name not in INDEXES[index_name][0]:
+                continue
+            if name in index.incremental:
+                getattr(index, method)(*args)
+            else:
+                del self._indexes[index_name]
+        self._notify(name, method, args[0] if method in ('put', 'delete') else None)
+
+    def index(self, index_name):
+        with self._lock:
+            sources, build = INDEXES[index_name]
+            data = [self.get(name) for name in sources]
+            if index_name not in self._indexes:
+                self._indexes[index_name] = build(*data)
+            return self._indexes[index_name]
+
+    def rollup(self):
+        """Daily per-activity totals, rebuilt only after logs or activities reload."""
+        return self.index('rollup')
+
+    def range_totals(self):
+        """Per-activity prefix sums for date-range totals, streaks and heatmaps."""
+        return self.index('totals')
+
+    def event_index(self):
+        return self.index('events')
+
+    def reminder_queue(self):
+        return self.index('reminders')
+
+    def notebook_index(self):
+        return self.index('notebooks')
+
+    def pop_due_reminders(self, now):
+        """Fire reminders due by ``now``; returns them and the next due time."""
+        with self._lock:
+            # The scheduler may wake once more after the store was closed
+            if self.closed:
+                return [], None
+            queue = self.reminder_queue()
+            return queue.pop_due(now), queue.next_due()
+
+    def _search_put(self, name, record, resync=False):
+        kind = SEARCH_SOURCES[name]
+        if name == 'notes':
+            doc = self._search.docs.get(f"note:{record['id']}")
+            preview = record.get('preview', '')
+            # On a resync, skip reading bodies of notes indexed at their
+            # current revision; every body change bumps the revision
+            if (resync and doc and doc['title'] == record['name'] and doc['snippet'] == preview
+                    and doc.get('version') == record.get('revision')):
+                return
+            body = self.storage.load_note_body(record['id'])
+            self._search.put(kind, record['id'], record['name'], body, preview, record.get('revision'))
+        else:
+            self._search.put(kind, record['id'], record['text'], '', record['due'])
+
+    def _sync_search(self, name, records):
+        kind = SEARCH_SOURCES[name]
+        for record in records:
+            self._search_put(name, record, resync=True)
+        for stale_id in self._search.keys(kind) - {record['id'] for record in records}:
+            self._search.delete(kind, stale_id)
+        self._search_synced[name] = records
+
+    def _search_changed(self, name, previous, record_id, record=None):
+        # Follow a single change only if the index was in step before it;
+        # otherwise search_index() resyncs the whole collection.
+        if self._search is None or self._search_synced.get(name) is not previous:
+            return
+        if record is None:
+            self._search.delete(SEARCH_SOURCES[name], record_id)
+        else:
+            self._search_put(name, record)
+        self._search_synced[name] = self._data[name]
+
+    def search_index(self):
+        """The persisted search index, brought in step with the collections."""
+        with self._lock:
+            if self._search is None:
+                self._search = SearchIndex.open(os.path.join(self.storage.data_dir, 'search'))
+            for name in SEARCH_SOURCES:
+                records = self.get(name)
+                if self._search_synced.get(name) is not records:
+                    self._sync_search(name, records)
+            return self._search
+
+    def search(self, query, limit=20):
+        with self._lock:
+            return self.search_index().search(query, limit)
+
+    def load_all(self):
+        return {name: self.get(name) for name in COLLECTIONS}
+
+    @contextmanager
+    def batch(self):
+        """Defer persistence of several changes to a single flush."""
+        with self._drained():
+            self._batch_depth += 1
+            try:
+                with self.storage.batch():
+                    yield
+            except BaseException:
+                # The backend rolled back, so cached containers may be ahead of it
+                self._data.clear()
+                self._signatures.clear()
+                self._indexes.clear()
+                for name in COLLECTIONS:
+                    self._notify(name)
+                raise
+            finally:
+                self._batch_depth -= 1
+
+    def flush(self, timeout=FLUSH_TIMEOUT):
+        """Wait until changes queued for write-behind are in storage.
+
+        Raises the writer's error as soon as a write fails, or TimeoutError.
+        """
+        if self._writer and not self._writer.flush(timeout, stop_on_error=True):
+            raise self._writer.last_error or TimeoutError(f"Changes not saved after {timeout}s")
+
+    @contextmanager
+    def _drained(self):
+        """Hold the store lock with nothing left for write-behind to write.
+
+        The wait happens without the lock so other sessions keep reading;
+        only the store queues changes, under the lock, so once it is held
+        with the writer idle nothing can slip in ahead.
+        """
+        deadline = time.monotonic() + FLUSH_TIMEOUT
+        while True:
+            self.flush(max(deadline - time.monotonic(), 0))
+            self._lock.acquire()
+            if not self._writer or self._writer.idle():
+                break
+            self._lock.release()
+        try:
+            yield
+        finally:
+            self._lock.release()
+
+    def write_error(self):
+        """The error from the last failed background write, if it is still failing."""
+        return self._writer.last_error if self._writer else None
+
+    def _write(self, name, record_id, method, *args):
+        if self._writer and not self._batch_depth:
+            self._writer.submit(name, record_id, method, *args)
+        else:
+            getattr(self.storage, method)(*args)
+            self._refresh_signature(name)
+
+    def _written(self, names):
+        # Called by the worker before the names stop counting as pending;
+        # storage now holds everything written for them
+        with self._lock:
+            for name in names:
+                if name in self._data:
+                    self._refresh_signature(name)
+
+    def _refresh_signature(self, name):
+        self._signatures[name] = self.storage.signature(name)
+
+    def put(self, name, record_id, record):
+        with self._lock:
+            current = self.get(name)
+            self._write(name, record_id, 'put', name, record_id, to_stored(record))
+            record = to_record(name, record)
+            if name == 'activities':
+                updated = dict(current)
+                updated[record_id] = record
+            else:
+                updated = list(current)
+                for i, existing in enumerate(updated):
+                    if existing.get('id') == record_id:
+                        updated[i] = record
+                        break
+                else:
+                    updated.append(record)
+            self._data[name] = updated
+            self._changed(name, 'put', record_id, record)
+            if name in SEARCH_SOURCES:
+                self._search_changed(name, current, record_id, record)
+
+    def delete(self, name, record_id):
+        with self._lock:
+            current = self.get(name)
+            self._write(name, record_id, 'delete', name, record_id)
+            if name == 'activities':
+                updated = {k: v for k, v in current.items() if k != record_id}
+            else:
+                updated = [r for r in current if r.get('id') != record_id]
+            self._data[name] = updated
+            self._changed(name, 'delete', record_id)
+            if name in SEARCH_SOURCES:
+                self._search_changed(name, current, record_id)
+
+    def append_log(self, entry):
+        with self._lock:
+            # Logs only ever grow and are appended in place; readers stop at
+            # the row count they read first (see LogTable).
+            logs = self.get('logs')
+            self._write('logs', None, 'append_log', entry)
+            logs.append(entry)
+            self._changed('logs', 'append', entry)
+
+    def put_many(self, name, records):
+        """Bulk insert or replace; the collection and its indexes reload lazily."""
+        with self._drained():
+            self.storage.put_many(name, records)
+            self._reload(name)
+
+    def append_logs(self, entries):
+        """Bulk append without growing the cached history; it reloads lazily."""
+        with self._drained():
+            self.storage.append_logs(entries)
+            self._reload('logs')
+
+    def iter_logs(self, start_month=None):
+        """Stream logs from the backend without loading the whole history."""
+        self.flush()
+        return self.storage.iter_logs(start_month)
+
+    def compact_logs(self, before_month, keep_raw=False):
+        """Fold every month of raw logs before ``before_month`` into summaries.
+
+        Months are compacted one at a time so sessions only wait for one.
+        Returns ``{month: raw entries compacted}``.
+        """
+        compacted = {}
+        self.flush()
+        for month in self.storage.log_months():
+            if month < before_month:
+                with self._lock:
+                    compacted[month] = self.storage.compact_logs(month, keep_raw)
+                    self._reload('logs')
+        return compacted
+
+    def _reload(self, name):
+        self._data.pop(name, None)
+        self._signatures.pop(name, None)
+        self._invalidate(name)
+
+    def note_body(self, note_id):
+        """Load one notebook's body on demand; the notes index holds only metadata."""
+        return self.storage.load_note_body(note_id)
+
+    def save_note(self, notebook, content, base_revision=None):
+        """Save a notebook body and record it as a new revision.
+
+        If ``base_revision`` is given and the stored notebook has moved past
+        it, another session saved in the meantime and ConflictError is raised
+        instead of overwriting that save. Returns the new revision number.
+        """
+        with self.batch():
+            # Revision numbers come from the stored metadata, not a session's copy
+            stored = next((n for n in self.get('notes') if n['id'] == notebook['id']), {})
+            if base_revision is not None and stored.get('revision', 0) != base_revision:
+                raise ConflictError(f"Notebook '{notebook['name']}' was changed in another session")
+            notebook = {**notebook, **{k: stored[k] for k in ('revision', 'snapshot_rev') if k in stored}}
+            previous = self.storage.load_note_body(notebook['id'])
+            if previous and not notebook.get('revision'):
+                # Keep the body written before history existed as revision 1
+                revision, notebook = new_revision(notebook, '', previous)
+                self.storage.append_note_revision(notebook['id'], revision)
+            if content != previous:
+                revision, notebook = new_revision(notebook, previous, content)
+                self.storage.append_note_revision(notebook['id'], revision)
+            self.storage.save_note_body(notebook['id'], content)
+            self.put('notes', notebook['id'], {**notebook, 'preview': content[:50]})
+            return notebook.get('revision', 0)
+
+    def note_revisions(self, note_id):
+        """Revision metadata (rev, saved, size), newest first."""
+        revisions = self.storage.load_note_revisions(note_id)
+        return [
+            {'rev': r['rev'], 'saved': r['saved'], 'size': r['size']}
+            for r in reversed(revisions)
+        ]
+
+    def note_revision(self, note_id, rev):
+        start = max(rev - SNAPSHOT_EVERY + 1, 1)
+        return text_at(self.storage.load_note_revisions(note_id, start, rev), rev)
+
+    def delete_note(self, note_id):
+        with self.batch():
+            self.delete('notes', note_id)
+            self.storage.delete_note_body(note_id)
+            self.storage.delete_note_revisions(note_id)
+
+    def clear(self):
+        with self._drained():
+            self.storage.clear()
+            self._data.clear()
+            self._signatures.clear()
+            self._indexes.clear()
+            SearchIndex(os.path.join(self.storage.data_dir, 'search')).save()
+            self._search = None
+            self._search_synced.clear()
+            self.stop_timer()
+            for name in COLLECTIONS:
+                self._notify(name)
+
+    def close(self):
+        """Save queued changes, then stop the writer and tell listeners.
+
+        Raises like ``flush()`` if changes cannot be saved; the store then
+        stays open. The storage backend is left for its owner to close.
+        """
+        with self._drained():
+            if self._writer:
+                self._writer.close()
+            self.closed = True
+            for callback in self._listeners:
+                callback(None)
+
+
+_stores = {}
+_last_used = {}
+_store_lock = threading.Lock()
+
+
+def get_store(namespace=None):
+    """The shared DataStore for a user namespace (``None`` for single-user mode)."""
+    with _store_lock:
+        now = time.monotonic()
+        _evict_idle(now - IDLE_SECONDS)
+        if namespace not in _stores:
+            _stores[namespace] = DataStore(get_storage(namespace), write_behind=True)
+        _last_used[namespace] = now
+        return _stores[namespace]
+
+
+def _evict_idle(cutoff):
+    # A running timer lives only in the store, so its namespace stays open
+    for namespace in [ns for ns, at in _last_used.items() if at < cutoff]:
+        store = _stores[namespace]
+        if store.running:
+            continue
+        try:
+            store.close()
+        except Exception:
+            # Still failing to save; keep the store and retry later
+            continue
+        del _stores[namespace], _last_used[namespace]
+        close_storage(namespace)
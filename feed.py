@@ -0,0 +1,48 @@
+import threading
+import time
+from collections import deque
+
+
+class ChangeFeed:
+    """Numbered change notices for one store, kept in a short history.
+
+    Every change gets the next version. A session remembers the last
+    version it applied and asks for what came after; once that has dropped
+    out of the history ``since()`` returns None and the session reloads in
+    full. Deltas are small: the collection and record id, or the running
+    activity, never the record itself, since sessions share the store's
+    cached collections.
+    """
+
+    def __init__(self, history=1000):
+        self.version = 0
+        self._deltas = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._seen = {}
+
+    def publish(self, kind, **fields):
+        with self._lock:
+            self.version += 1
+            self._deltas.append({'version': self.version, 'kind': kind, **fields})
+            return self.version
+
+    def since(self, version):
+        """Deltas after ``version`` in order, or None if some were dropped."""
+        with self._lock:
+            if version == self.version:
+                return []
+            if version > self.version or not self._deltas or self._deltas[0]['version'] > version + 1:
+                return None
+            return [delta for delta in self._deltas if delta['version'] > version]
+
+    def seen(self, session_id):
+        with self._lock:
+            self._seen[session_id] = time.monotonic()
+
+    def watchers(self, within=60):
+        """Sessions that read the feed in the last ``within`` seconds."""
+        cutoff = time.monotonic() - within
+        with self._lock:
+            for session_id in [s for s, at in self._seen.items() if at < cutoff]:
+                del self._seen[session_id]
+            return len(self._seen)
@@ -0,0 +1,509 @@
+import heapq
+import threading
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+from datetime import date, datetime, time, timedelta
+from itertools import islice
+
+from recurrence import next_occurrence, occurrences
+
+# Recurring-event windows (a viewed month, the next seven days) kept expanded
+WINDOW_CACHE_SIZE = 32
+
+
+def log_activity_key(log, keys_by_name):
+    """Activity key for a log, falling back to its display name for old logs."""
+    return log.get('activity_id') or keys_by_name.get(log.get('activity'))
+
+
+class DailyRollup:
+    """Per-day, per-activity totals and completion flags.
+
+    Built once from the full log history, then kept current by ``append()``
+    as each session is recorded, so reading a day is a single dict lookup.
+    """
+
+    incremental = ('logs',)
+
+    def __init__(self, activities):
+        self.keys_by_name = {act['name']: key for key, act in activities.items()}
+        self.days = {}
+
+    @classmethod
+    def build(cls, logs, activities):
+        rollup = cls(activities)
+        for day, activity_id, activity, duration, completed in logs.rows():
+            rollup._add(day, activity_id or rollup.keys_by_name.get(activity), duration, completed)
+        return rollup
+
+    def append(self, log):
+        self._add(log['date'], log_activity_key(log, self.keys_by_name), log['duration'], log['completed'])
+
+    def _add(self, day, key, duration, completed):
+        if key is None:
+            return
+        bucket = self.days.setdefault(day, {}).setdefault(
+            key, {'total': 0, 'completed': False}
+        )
+        bucket['total'] += duration
+        if completed:
+            bucket['completed'] = True
+
+    def day(self, day):
+        return {key: dict(totals) for key, totals in self.days.get(day, {}).items()}
+
+
+class Fenwick:
+    """Binary indexed tree over positions ``1..size``; ``size`` is a power of two."""
+
+    __slots__ = ('tree',)
+
+    def __init__(self, size, values=None):
+        tree = [0] * (size + 1)
+        for i, value in (values or {}).items():
+            tree[i] += value
+        # Linear-time build: push each node's sum up to its parent
+        for i in range(1, size + 1):
+            parent = i + (i & -i)
+            if parent <= size:
+                tree[parent] += tree[i]
+        self.tree = tree
+
+    def add(self, i, delta):
+        tree = self.tree
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def prefix(self, i):
+        total = 0
+        tree = self.tree
+        i = min(i, len(tree) - 1)
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+
+class DaySeries:
+    """One activity's seconds per day, as prefix sums over day numbers.
+
+    ``seconds`` answers range totals and ``active`` (1 for a day with any
+    time) answers streaks, each in O(log n). Days are numbered from
+    ``base``; a day outside the span doubles it and rebuilds the trees.
+    """
+
+    __slots__ = ('base', 'size', 'daily', 'seconds', 'active')
+
+    def __init__(self, daily):
+        self.daily = daily
+        first = min(daily, default=date.today().toordinal())
+        self._rebuild(first, max(daily, default=first))
+
+    def _rebuild(self, first, last):
+        self.base = first
+        self.size = 1 << max(last - first + 1, 366).bit_length()
+        positions = {day - first + 1: total for day, total in self.daily.items()}
+        self.seconds = Fenwick(self.size, positions)
+        self.active = Fenwick(self.size, {i: 1 for i, total in positions.items() if total > 0})
+
+    def add(self, day, seconds):
+        before = self.daily.get(day, 0)
+        self.daily[day] = before + seconds
+        if not self.base <= day < self.base + self.size:
+            self._rebuild(min(day, self.base), max(day, self.base + self.size - 1))
+            return
+        i = day - self.base + 1
+        self.seconds.add(i, seconds)
+        if (before > 0) != (before + seconds > 0):
+            self.active.add(i, 1 if before + seconds > 0 else -1)
+
+    def total(self, first, last):
+        first, last = max(first, self.base), min(last, self.base + self.size - 1)
+        if first > last:
+            return 0
+        return self.seconds.prefix(last - self.base + 1) - self.seconds.prefix(first - self.base)
+
+    def streak(self, day):
+        """Consecutive days with time logged, ending on ``day``."""
+        if self.daily.get(day, 0) <= 0:
+            return 0
+        i = day - self.base + 1
+        gaps = i - self.active.prefix(i)
+        if not gaps:
+            return i
+        # Descend the tree to the latest day without time at or before ``day``
+        pos, step, tree = 0, self.size, self.active.tree
+        while step:
+            node = pos + step
+            if node <= self.size and step - tree[node] < gaps:
+                pos = node
+                gaps -= step - tree[node]
+            step >>= 1
+        return i - (pos + 1)
+
+
+class RangeTotals:
+    """Per-activity ``DaySeries`` plus one across all activities (``ALL``).
+
+    Built from the logs once and kept current by ``append()``, so a
+    date-range total, a streak or a year of daily totals never re-reads
+    the history.
+    """
+
+    ALL = None
+    incremental = ('logs',)
+
+    def __init__(self, activities):
+        self.keys_by_name = {act['name']: key for key, act in activities.items()}
+        self.series = {}
+
+    @classmethod
+    def build(cls, logs, activities):
+        totals = cls(activities)
+        daily = {}
+        ordinals = {}
+        for day, activity_id, activity, duration, _ in logs.rows():
+            key = activity_id or totals.keys_by_name.get(activity)
+            if key is None:
+                continue
+            ordinal = ordinals.get(day)
+            if ordinal is None:
+                ordinal = ordinals[day] = date.fromisoformat(day).toordinal()
+            for series_key in (key, cls.ALL):
+                days = daily.setdefault(series_key, {})
+                days[ordinal] = days.get(ordinal, 0) + duration
+        totals.series = {key: DaySeries(days) for key, days in daily.items()}
+        return totals
+
+    def append(self, log):
+        key = log_activity_key(log, self.keys_by_name)
+        if key is None:
+            return
+        day = date.fromisoformat(log['date']).toordinal()
+        for series_key in (key, self.ALL):
+            if series_key not in self.series:
+                self.series[series_key] = DaySeries({})
+            self.series[series_key].add(day, log['duration'])
+
+    def total(self, key, start, end):
+        """Seconds logged for ``key`` from date ``start`` to ``end`` inclusive."""
+        series = self.series.get(key)
+        return series.total(start.toordinal(), end.toordinal()) if series else 0
+
+    def streak(self, key, day):
+        series = self.series.get(key)
+        return series.streak(day.toordinal()) if series else 0
+
+    def daily(self, key, start, end):
+        """Seconds per date from ``start`` to ``end``, for heatmaps."""
+        series = self.series.get(key)
+        days = series.daily if series else {}
+        first = start.toordinal()
+        return [days.get(day, 0) for day in range(first, end.toordinal() + 1)]
+
+
+class EventIndex:
+    """Calendar events bucketed by date and kept in due-time order.
+
+    ``by_day`` maps a date to its time-sorted ``(due, id)`` keys and a single
+    sorted key list answers range queries with bisect. Entries carry the
+    event's parsed ``due`` alongside it.
+
+    Repeating events are held as rules in ``recurring`` and only expanded
+    for the window being asked about; each window's occurrences are cached
+    until a repeating event changes.
+    """
+
+    incremental = ('calendar_events',)
+
+    def __init__(self):
+        self.by_day = {}
+        self.keys = []
+        self.events = {}
+        self.recurring = {}
+        self._windows = OrderedDict()
+        self._windows_lock = threading.Lock()
+
+    @classmethod
+    def build(cls, events):
+        index = cls()
+        for event in events:
+            if event.repeat:
+                index.recurring[event['id']] = event
+            else:
+                index.events[event['id']] = (event.due, event)
+        index.keys = sorted((due, event_id) for event_id, (due, _) in index.events.items())
+        for key in index.keys:
+            index.by_day.setdefault(key[0].date(), []).append(key)
+        return index
+
+    def put(self, event_id, event):
+        if event_id in self.events or event_id in self.recurring:
+            self.delete(event_id)
+        if event.repeat:
+            self.recurring[event_id] = event
+            self._clear_windows()
+            return
+        key = (event.due, event_id)
+        self.events[event_id] = (key[0], event)
+        insort(self.keys, key)
+        insort(self.by_day.setdefault(key[0].date(), []), key)
+
+    def delete(self, event_id):
+        if self.recurring.pop(event_id, None) is not None:
+            self._clear_windows()
+            return
+        if event_id not in self.events:
+            return
+        due, _ = self.events.pop(event_id)
+        key = (due, event_id)
+        del self.keys[bisect_left(self.keys, key)]
+        day_keys = self.by_day[due.date()]
+        del day_keys[bisect_left(day_keys, key)]
+        if not day_keys:
+            del self.by_day[due.date()]
+
+    def _clear_windows(self):
+        with self._windows_lock:
+            self._windows.clear()
+
+    def _occurrences(self, start, end):
+        """Sorted ``(due, id)`` keys of repeating events from ``start`` to ``end``."""
+        window = (start, end)
+        with self._windows_lock:
+            if window in self._windows:
+                self._windows.move_to_end(window)
+                return self._windows[window]
+        lo = datetime.combine(start, time.min)
+        hi = datetime.combine(end + timedelta(days=1), time.min)
+        keys = sorted(
+            (due, event_id)
+            for event_id, event in list(self.recurring.items())
+            for due in occurrences(event.due, event.repeat, lo, hi)
+        )
+        with self._windows_lock:
+            self._windows[window] = keys
+            if len(self._windows) > WINDOW_CACHE_SIZE:
+                self._windows.popitem(last=False)
+        return keys
+
+    def _entries(self, keys):
+        return [(due, self.recurring[event_id]) if event_id in self.recurring else self.events[event_id]
+                for due, event_id in keys]
+
+    def _bounds(self, start, end):
+        lo = bisect_left(self.keys, (datetime.combine(start, time.min),))
+        hi = bisect_right(self.keys, (datetime.combine(end + timedelta(days=1), time.min),))
+        return lo, hi
+
+    def _slice(self, start, end):
+        lo, hi = self._bounds(start, end)
+        return self.keys[lo:hi]
+
+    def day(self, day):
+        """``(due, event)`` pairs on ``day`` in time order."""
+        return self.between(day, day)
+
+    def count(self, day):
+        return len(self.by_day.get(day, ())) + len(self._occurrences(day, day))
+
+    def counts(self, start, end):
+        """Events per date from ``start`` to ``end``, expanding repeats once for the range."""
+        counts = {}
+        for due, _ in heapq.merge(self._slice(start, end), self._occurrences(start, end)):
+            counts[due.date()] = counts.get(due.date(), 0) + 1
+        return counts
+
+    def between(self, start, end):
+        """``(due, event)`` pairs with ``start <= due.date() <= end``."""
+        return self._entries(heapq.merge(self._slice(start, end), self._occurrences(start, end)))
+
+    def page(self, start, end, offset, limit):
+        """One page of ``between(start, end)`` and the total, without building the rest."""
+        lo, hi = self._bounds(start, end)
+        repeats = self._occurrences(start, end)
+        keys = heapq.merge((self.keys[i] for i in range(lo, hi)), repeats)
+        return self._entries(islice(keys, offset, offset + limit)), hi - lo + len(repeats)
+
+    def upcoming(self, start, limit, days=7):
+        """The first ``limit`` events in the ``days`` days from the date ``start``."""
+        return self.between(start, start + timedelta(days=days - 1))[:limit]
+
+
+class ReminderQueue:
+    """Min-heap of pending reminder due times plus the set already overdue.
+
+    Deleted or rescheduled reminders leave stale heap entries behind; they
+    are skipped when they reach the top instead of being searched for. A
+    repeating reminder is queued at its next occurrence only; when that
+    fires the one after it is queued, and it goes overdue once the series
+    has ended.
+
+    ``by_status`` keeps each status's ``(due, id)`` keys sorted so a page
+    of active, overdue or completed reminders is a slice.
+    """
+
+    STATUSES = ('active', 'overdue', 'completed')
+    incremental = ('reminders',)
+
+    def __init__(self):
+        self.heap = []
+        self.due = {}
+        self.reminders = {}
+        self.overdue = set()
+        self.by_status = {status: [] for status in self.STATUSES}
+        self.placed = {}
+
+    @classmethod
+    def build(cls, reminders, now=None):
+        now = now or datetime.now()
+        queue = cls()
+        for reminder in reminders:
+            queue._track(reminder, now)
+            if reminder['completed']:
+                continue
+            due = queue.due[reminder['id']]
+            if due <= now:
+                queue.overdue.add(reminder['id'])
+            else:
+                queue.heap.append((due, reminder['id']))
+        heapq.heapify(queue.heap)
+        for reminder_id in queue.reminders:
+            status = queue._status(reminder_id)
+            key = (queue.due[reminder_id], reminder_id)
+            queue.by_status[status].append(key)
+            queue.placed[reminder_id] = (status, key)
+        for keys in queue.by_status.values():
+            keys.sort()
+        return queue
+
+    def _status(self, reminder_id):
+        if self.reminders[reminder_id]['completed']:
+            return 'completed'
+        return 'overdue' if reminder_id in self.overdue else 'active'
+
+    def _place(self, reminder_id):
+        self._unplace(reminder_id)
+        status = self._status(reminder_id)
+        key = (self.due[reminder_id], reminder_id)
+        insort(self.by_status[status], key)
+        self.placed[reminder_id] = (status, key)
+
+    def _unplace(self, reminder_id):
+        placed = self.placed.pop(reminder_id, None)
+        if placed:
+            keys = self.by_status[placed[0]]
+            del keys[bisect_left(keys, placed[1])]
+
+    def _track(self, reminder, now):
+        due = reminder.due
+        if reminder.repeat:
+            # Skipped dates, until and count apply to the first occurrence too;
+            # a series with nothing left to fire counts as overdue
+            start = max(reminder.due, now + timedelta(microseconds=1))
+            due = next(occurrences(reminder.due, reminder.repeat, start), None) or min(due, now)
+        self.due[reminder['id']] = due
+        self.reminders[reminder['id']] = reminder
+
+    def put(self, reminder_id, reminder):
+        now = datetime.now()
+        self.overdue.discard(reminder_id)
+        self._track(reminder, now)
+        if not reminder['completed']:
+            due = self.due[reminder_id]
+            if due <= now:
+                self.overdue.add(reminder_id)
+            else:
+                heapq.heappush(self.heap, (due, reminder_id))
+        self._place(reminder_id)
+
+    def delete(self, reminder_id):
+        self._unplace(reminder_id)
+        self.due.pop(reminder_id, None)
+        self.reminders.pop(reminder_id, None)
+        self.overdue.discard(reminder_id)
+
+    def _is_live(self, entry):
+        due, reminder_id = entry
+        return (
+            self.due.get(reminder_id) == due
+            and reminder_id not in self.overdue
+            and not self.reminders[reminder_id]['completed']
+        )
+
+    def next_due(self):
+        while self.heap and not self._is_live(self.heap[0]):
+            heapq.heappop(self.heap)
+        return self.heap[0][0] if self.heap else None
+
+    def pop_due(self, now):
+        """Mark every reminder due by ``now`` overdue and return them."""
+        fired = []
+        while self.next_due() is not None and self.heap[0][0] <= now:
+            due, reminder_id = heapq.heappop(self.heap)
+            reminder = self.reminders[reminder_id]
+            following = reminder.repeat and next_occurrence(reminder.due, reminder.repeat, max(due, now))
+            if following:
+                self.due[reminder_id] = following
+                heapq.heappush(self.heap, (following, reminder_id))
+            else:
+                self.overdue.add(reminder_id)
+            self._place(reminder_id)
+            fired.append(reminder)
+        return fired
+
+    def count(self, status):
+        return len(self.by_status[status])
+
+    def page(self, status, offset, limit):
+        """Reminders with ``status`` in due order, ``limit`` from ``offset``."""
+        return [self.reminders[reminder_id] for _, reminder_id in self.by_status[status][offset:offset + limit]]
+
+    def is_overdue(self, reminder_id):
+        return reminder_id in self.overdue
+
+
+class NotebookIndex:
+    """Notebooks sorted by case-folded name, for paging and name-prefix filters."""
+
+    incremental = ('notes',)
+
+    def __init__(self):
+        self.keys = []
+        self.notes = {}
+
+    @classmethod
+    def build(cls, notes):
+        index = cls()
+        for note in notes:
+            index.notes[note['id']] = note
+        index.keys = sorted((note['name'].casefold(), note_id) for note_id, note in index.notes.items())
+        return index
+
+    def put(self, note_id, note):
+        self.delete(note_id)
+        self.notes[note_id] = note
+        insort(self.keys, (note['name'].casefold(), note_id))
+
+    def delete(self, note_id):
+        note = self.notes.pop(note_id, None)
+        if note is not None:
+            key = (note['name'].casefold(), note_id)
+            del self.keys[bisect_left(self.keys, key)]
+
+    def _bounds(self, prefix):
+        prefix = prefix.casefold()
+        if not prefix:
+            return 0, len(self.keys)
+        # Every key starting with ``prefix`` sorts between it and its successor
+        return bisect_left(self.keys, (prefix,)), bisect_left(self.keys, (prefix + '\U0010ffff',))
+
+    def count(self, prefix=''):
+        lo, hi = self._bounds(prefix)
+        return hi - lo
+
+    def page(self, prefix, offset, limit):
+        lo, hi = self._bounds(prefix)
+        start = lo + offset
+        return [self.notes[note_id] for _, note_id in self.keys[start:min(start + limit, hi)]]
@@ -0,0 +1,161 @@
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Instrumentation is off unless PRODUCTIVITY_PROFILE=1. While off, profiled()
+# returns functions unwrapped and storage is left as is, so the hot paths pay
+# nothing at all.
+ENABLED = os.environ.get('PRODUCTIVITY_PROFILE') == '1'
+METRICS_FILE = os.environ.get('PRODUCTIVITY_METRICS_FILE', os.path.join('data', 'metrics.prom'))
+METRICS_PORT = os.environ.get('PRODUCTIVITY_METRICS_PORT')
+
+STORAGE_METHODS = (
+    'signature', 'load', 'put', 'put_many', 'delete', 'append_log', 'append_logs', 'flush',
+    'load_note_body', 'save_note_body', 'load_note_revisions', 'append_note_revision', 'compact_logs',
+)
+
+
+class Registry:
+    """Timings per (kind, name) and byte counters, process-wide and per rerun.
+
+    The per-rerun view is thread-local: Streamlit runs each session's script
+    in its own thread, so ``start_run()`` at the top of a rerun scopes what
+    that rerun's debug panel shows.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.timings = {}
+        self.bytes = {'read': 0, 'written': 0}
+        self._local = threading.local()
+
+    def start_run(self):
+        self._local.run = {'timings': {}, 'bytes': {'read': 0, 'written': 0}}
+
+    def current_run(self):
+        return getattr(self._local, 'run', None)
+
+    def observe(self, kind, name, seconds):
+        key = (kind, name)
+        with self._lock:
+            count, total, peak = self.timings.get(key, (0, 0.0, 0.0))
+            self.timings[key] = (count + 1, total + seconds, max(peak, seconds))
+        run = self.current_run()
+        if run is not None:
+            count, total = run['timings'].get(key, (0, 0.0))
+            run['timings'][key] = (count + 1, total + seconds)
+
+    def add_bytes(self, direction, n):
+        with self._lock:
+            self.bytes[direction] += n
+        run = self.current_run()
+        if run is not None:
+            run['bytes'][direction] += n
+
+    def prometheus(self):
+        """Everything recorded so far in Prometheus text exposition format."""
+        with self._lock:
+            timings = sorted(self.timings.items())
+            counters = dict(self.bytes)
+        lines = [
+            '# HELP productivity_seconds Time spent per app phase, tab and storage call.',
+            '# TYPE productivity_seconds summary',
+        ]
+        for (kind, name), (count, total, _) in timings:
+            labels = f'kind="{kind}",name="{name}"'
+            lines.append(f'productivity_seconds_count{{{labels}}} {count}')
+            lines.append(f'productivity_seconds_sum{{{labels}}} {total:.6f}')
+        lines += [
+            '# HELP productivity_seconds_max Slowest single call per phase, tab and storage call.',
+            '# TYPE productivity_seconds_max gauge',
+        ]
+        for (kind, name), (_, _, peak) in timings:
+            lines.append(f'productivity_seconds_max{{kind="{kind}",name="{name}"}} {peak:.6f}')
+        lines += [
+            '# HELP productivity_storage_bytes_total Bytes of records and note bodies read and written by storage.',
+            '# TYPE productivity_storage_bytes_total counter',
+        ]
+        for direction, n in sorted(counters.items()):
+            lines.append(f'productivity_storage_bytes_total{{direction="{direction}"}} {n}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path=METRICS_FILE):
+        directory = os.path.dirname(path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(self.prometheus())
+        os.replace(tmp_path, path)
+
+
+registry = Registry()
+
+
+@contextmanager
+def _timed(kind, name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe(kind, name, time.perf_counter() - start)
+
+
+def profiled(kind, name=None):
+    """Decorator timing every call of a function under ``kind``."""
+    def decorate(func):
+        if not ENABLED:
+            return func
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _timed(kind, label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def add_bytes(direction, n):
+    if ENABLED:
+        registry.add_bytes(direction, n)
+
+
+def instrument_storage(storage):
+    """Time each backend call by wrapping the methods on this instance."""
+    if not ENABLED:
+        return storage
+    for method in STORAGE_METHODS:
+        if hasattr(storage, method):
+            setattr(storage, method, profiled('storage', method)(getattr(storage, method)))
+    return storage
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = registry.prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def serve(port=METRICS_PORT):
+    """Serve /metrics on ``port`` from a daemon thread, once per process."""
+    global _server
+    if not (ENABLED and port):
+        return
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer(('127.0.0.1', int(port)), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name='metrics-server', daemon=True).start()
@@ -0,0 +1,191 @@
+import math
+from array import array
+from datetime import datetime
+
+
+class Record:
+    """Slotted record built once from its stored dict.
+
+    Datetime fields are parsed when the record is loaded. ``record['due']``
+    still returns the ISO string and ``dict(record)`` the stored form, so
+    code written against plain dicts keeps working. Keys the class does not
+    know are carried in ``extra`` so nothing is lost.
+    """
+
+    __slots__ = ('extra',)
+    fields = ()
+    datetime_fields = ()
+    # Left out of the stored form while unset
+    optional_fields = ()
+
+    def __init__(self, **values):
+        for field in self.fields:
+            setattr(self, field, values.pop(field, None))
+        self.extra = values or None
+
+    @classmethod
+    def from_dict(cls, data):
+        values = dict(data)
+        for field in cls.datetime_fields:
+            if values.get(field):
+                values[field] = datetime.fromisoformat(values[field])
+        return cls(**values)
+
+    def keys(self):
+        fields = [field for field in self.fields if field not in self.optional_fields or getattr(self, field) is not None]
+        return fields + list(self.extra or ())
+
+    def __getitem__(self, key):
+        if key in self.fields:
+            value = getattr(self, key)
+            return value.isoformat() if isinstance(value, datetime) else value
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self.fields or bool(self.extra and key in self.extra)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self):
+        return {key: self[key] for key in self.keys()}
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.to_dict()!r})'
+
+
+class Reminder(Record):
+    __slots__ = ('id', 'text', 'due', 'completed', 'repeat')
+    fields = __slots__
+    datetime_fields = ('due',)
+    optional_fields = ('repeat',)
+
+
+class Event(Record):
+    __slots__ = ('id', 'text', 'due', 'color', 'repeat')
+    fields = __slots__
+    datetime_fields = ('due',)
+    optional_fields = ('repeat',)
+
+
+class Interner:
+    """Numbers distinct values so a column stores one small int per row."""
+
+    __slots__ = ('values', 'codes')
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class LogTable:
+    """Activity logs held column-wise in typed arrays.
+
+    Dates and ``(activity_id, activity)`` pairs are interned, durations are
+    doubles and start times epoch seconds (NaN when absent), so a row costs
+    a few array slots instead of a dict of strings. The rollup and analytics
+    read the columns directly; indexing and iteration rebuild dicts for
+    anything else. Rows are appended in place while other threads read, so
+    readers take ``len()`` once and go no further than that row.
+    """
+
+    def __init__(self, logs=()):
+        self.dates = Interner()
+        self.activities = Interner()
+        self.date = array('l')
+        self.activity = array('l')
+        self.duration = array('d')
+        self.completed = bytearray()
+        self.start = array('d')
+        self.sessions = array('l')
+        for log in logs:
+            self.append(log)
+
+    def append(self, log):
+        self.date.append(self.dates.code(log['date']))
+        self.activity.append(self.activities.code((log.get('activity_id'), log.get('activity', ''))))
+        self.duration.append(float(log['duration']))
+        self.completed.append(bool(log.get('completed')))
+        start = log.get('start_time')
+        self.start.append(datetime.fromisoformat(start).timestamp() if start else math.nan)
+        # Compacted summaries count their sessions; raw entries store 0
+        self.sessions.append(log.get('sessions', 0))
+
+    def __len__(self):
+        # ``sessions`` is appended last, so every column holds at least this
+        # many rows even while another thread is appending
+        return len(self.sessions)
+
+    def record(self, i):
+        activity_id, activity = self.activities.values[self.activity[i]]
+        log = {
+            'activity_id': activity_id,
+            'activity': activity,
+            'date': self.dates.values[self.date[i]],
+            'duration': self.duration[i],
+            'completed': bool(self.completed[i]),
+        }
+        if not math.isnan(self.start[i]):
+            log['start_time'] = datetime.fromtimestamp(self.start[i]).isoformat()
+        if self.sessions[i]:
+            log['sessions'] = self.sessions[i]
+        return log
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.record(j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.record(i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.record(i)
+
+    def rows(self, start=0):
+        """``(date, activity_id, activity, duration, completed)`` per row."""
+        dates = self.dates.values
+        activities = self.activities.values
+        for i in range(start, len(self)):
+            activity_id, activity = activities[self.activity[i]]
+            yield dates[self.date[i]], activity_id, activity, self.duration[i], bool(self.completed[i])
+
+
+MODELS = {
+    'reminders': Reminder,
+    'calendar_events': Event,
+}
+
+
+def to_model(name, data):
+    """Typed form of a collection as loaded from storage."""
+    if name == 'logs':
+        return LogTable(data)
+    if name in MODELS:
+        return [MODELS[name].from_dict(record) for record in data]
+    return data
+
+
+def to_record(name, record):
+    if name in MODELS and not isinstance(record, Record):
+        return MODELS[name].from_dict(record)
+    return record
+
+
+def to_stored(record):
+    """Plain dict for storage from a record in either form."""
+    return record.to_dict() if isinstance(record, Record) else record
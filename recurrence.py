@@ -0,0 +1,122 @@
+import calendar
+import math
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+
+# A rule is stored on the event or reminder as ``repeat``; ``due`` is its
+# first occurrence. Only the rule is stored, never the occurrences:
+#   {'freq': 'daily' | 'weekly' | 'monthly', 'interval': 1,
+#    'weekdays': [0, 2],          # weekly only, Monday is 0
+#    'until': 'YYYY-MM-DD',       # optional last date
+#    'count': 10,                 # optional number of occurrences
+#    'except': ['YYYY-MM-DD']}    # dates skipped; they still use up count
+FREQUENCIES = ('daily', 'weekly', 'monthly')
+WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+
+def validate_rule(rule):
+    """A normalised copy of ``rule``; raises ValueError if it is malformed."""
+    if rule['freq'] not in FREQUENCIES:
+        raise ValueError(f"unknown repeat frequency: {rule['freq']!r}")
+    interval = int(rule['interval']) if rule.get('interval') is not None else 1
+    if interval < 1:
+        raise ValueError("repeat interval must be at least 1")
+    normalised = {'freq': rule['freq'], 'interval': interval}
+    if rule['freq'] == 'weekly' and rule.get('weekdays'):
+        weekdays = sorted({int(day) for day in rule['weekdays']})
+        if not all(0 <= day <= 6 for day in weekdays):
+            raise ValueError("weekdays run from 0 (Monday) to 6 (Sunday)")
+        normalised['weekdays'] = weekdays
+    if rule.get('until'):
+        normalised['until'] = date.fromisoformat(str(rule['until'])[:10]).isoformat()
+    if rule.get('count') is not None:
+        count = int(rule['count'])
+        if count < 1:
+            raise ValueError("repeat count must be at least 1")
+        normalised['count'] = count
+    if rule.get('except'):
+        normalised['except'] = sorted({date.fromisoformat(str(day)[:10]).isoformat() for day in rule['except']})
+    return normalised
+
+
+def _candidates(first, freq, interval, weekdays, start):
+    """Times the rule produces on or after ``start``, ignoring its end and exceptions."""
+    if freq == 'daily':
+        step = timedelta(days=interval)
+        k = max(0, math.ceil((start - first) / step))
+        while True:
+            yield first + k * step
+            k += 1
+    elif freq == 'weekly':
+        week0 = first - timedelta(days=first.weekday())
+        k = max(0, (start - week0).days // (7 * interval))
+        while True:
+            monday = week0 + timedelta(weeks=k * interval)
+            for weekday in weekdays:
+                moment = monday + timedelta(days=weekday)
+                if moment >= first and moment >= start:
+                    yield moment
+            k += 1
+    else:
+        month0 = first.year * 12 + first.month - 1
+        k = max(0, (start.year * 12 + start.month - 1 - month0) // interval)
+        while True:
+            year, month = divmod(month0 + k * interval, 12)
+            # Months without the start's day (the 31st, say) are skipped
+            if first.day <= calendar.monthrange(year, month + 1)[1]:
+                moment = first.replace(year=year, month=month + 1)
+                if moment >= start:
+                    yield moment
+            k += 1
+
+
+def _weekdays(first, rule):
+    return tuple(rule.get('weekdays') or (first.weekday(),))
+
+
+@lru_cache(maxsize=1024)
+def _nth(first, freq, interval, weekdays, n):
+    """The ``n``-th time (from 1) of a rule; bounded by ``count`` and cached."""
+    for i, moment in enumerate(_candidates(first, freq, interval, weekdays, first), 1):
+        if i == n:
+            return moment
+
+
+def last_time(first, rule):
+    """Latest time the rule can produce, or None if it repeats forever."""
+    stops = []
+    if rule.get('until'):
+        stops.append(datetime.combine(date.fromisoformat(rule['until']), time.max))
+    if rule.get('count'):
+        stops.append(_nth(first, rule['freq'], rule.get('interval') or 1, _weekdays(first, rule), rule['count']))
+    return min(stops) if stops else None
+
+
+def occurrences(first, rule, start, end=None):
+    """Occurrence times with ``start <= t < end``, generated lazily in order."""
+    stop = last_time(first, rule)
+    skipped = set(rule.get('except') or ())
+    candidates = _candidates(first, rule['freq'], rule.get('interval') or 1, _weekdays(first, rule), start)
+    for moment in candidates:
+        if (end is not None and moment >= end) or (stop is not None and moment > stop):
+            return
+        if moment.date().isoformat() not in skipped:
+            yield moment
+
+
+def next_occurrence(first, rule, after):
+    """First occurrence strictly after ``after``, or None once the series has ended."""
+    return next(occurrences(first, rule, after + timedelta(microseconds=1)), None)
+
+
+def describe(rule):
+    interval = rule.get('interval') or 1
+    unit = {'daily': 'day', 'weekly': 'week', 'monthly': 'month'}[rule['freq']]
+    text = f"every {unit}" if interval == 1 else f"every {interval} {unit}s"
+    if rule.get('weekdays'):
+        text += " on " + ", ".join(WEEKDAYS[day] for day in rule['weekdays'])
+    if rule.get('until'):
+        text += f" until {rule['until']}"
+    if rule.get('count'):
+        text += f", {rule['count']} times"
+    return text
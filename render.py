@@ -0,0 +1,346 @@
+import json
+from datetime import timedelta
+from functools import lru_cache
+
+# Every static style rule in the app, hoisted out of the render functions
+APP_CSS = """
+    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;600&display=swap');
+    
+    * {
+        font-family: 'Inter', sans-serif;
+    }
+    
+    .stApp {
+        background: #1a1a1a;
+        color: #ffffff;
+    }
+    
+    .compact-card {
+        padding: 1rem;
+        border-radius: 8px;
+        margin: 1rem 0;
+        background: #2d2d2d;
+        border-left: 4px solid;
+    }
+    
+    .corner-timer {
+        position: fixed;
+        bottom: 20px;
+        right: 20px;
+        background: #2d2d2d;
+        padding: 1rem 2rem;
+        border-radius: 8px;
+        color: #ffffff;
+        border: 1px solid #404040;
+        z-index: 999;
+        box-shadow: 0 2px 8px rgba(0,0,0,0.3);
+    }
+    
+    .progress-container {
+        margin: 1rem 0;
+        padding: 0.5rem;
+    }
+    
+    .calendar-day {
+        width: 100% !important;
+        height: 60px !important;
+        margin: 2px 0 !important;
+    }
+    
+    .reminder-item {
+        padding: 0.5rem;
+        margin: 0.5rem 0;
+        border-left: 4px solid;
+        background: #2d2d2d;
+        border-radius: 4px;
+    }
+    
+    .notes-container {
+        border-left: 4px solid;
+        padding: 1rem;
+        margin: 1rem 0;
+        background: #2d2d2d;
+        border-radius: 8px;
+    }
+    
+    .notes-preview {
+        padding: 1rem;
+        background: #1a1a1a;
+        border-radius: 8px;
+        border: 1px solid #404040;
+        margin: 1rem 0;
+        color: #ffffff;
+    }
+    
+    .notes-editor {
+        margin: 1rem 0;
+    }
+    
+    .notes-toolbar {
+        margin-bottom: 1rem;
+    }
+    
+    .formatting-help {
+        font-size: 0.8em;
+        color: #a0a0a0;
+        padding: 0.5rem;
+        background: #2d2d2d;
+        border-radius: 8px;
+        margin: 1rem 0;
+    }
+    
+    .upcoming-event {
+        padding: 0.5rem;
+        margin: 0.5rem 0;
+        border-radius: 8px;
+        background: #2d2d2d;
+    }
+    
+    .stTextInput input, .stTextArea textarea {
+        background-color: #2d2d2d !important;
+        color: #ffffff !important;
+    }
+    
+    .stSelectbox select {
+        background-color: #2d2d2d !important;
+        color: #ffffff !important;
+    }
+    
+    .stDateInput input {
+        background-color: #2d2d2d !important;
+        color: #ffffff !important;
+    }
+    
+    .stTimeInput input {
+        background-color: #2d2d2d !important;
+        color: #ffffff !important;
+    }
+    
+    .stButton button {
+        background-color: #4f8bf9;
+        color: white;
+        border: none;
+        border-radius: 4px;
+        padding: 0.5rem 1rem;
+    }
+    
+    .stButton button:hover {
+        background-color: #3b6bb8;
+        color: white;
+    }
+    
+    .stProgress > div > div > div {
+        background-color: #4f8bf9 !important;
+    }
+
+    /* Notes tab */
+    .notebook-card {
+        padding: 1rem;
+        margin: 0.5rem 0;
+        border: 2px solid #4a90e2;
+        border-radius: 10px;
+        background: white;
+        transition: transform 0.2s;
+    }
+    .notebook-card:hover {
+        transform: translateY(-2px);
+        box-shadow: 0 2px 8px rgba(74, 144, 226, 0.2);
+    }
+    .editor-container {
+        border: 2px solid #4a90e2;
+        border-radius: 10px;
+        padding: 1.5rem;
+        margin: 1rem 0;
+        background: #2d3436;
+    }
+    .editor-container textarea {
+        background-color: #2d3436 !important;
+        color: white !important;
+        border: 1px solid #4a90e2 !important;
+        border-radius: 8px !important;
+        padding: 1rem !important;
+        font-family: 'Inter', sans-serif !important;
+        font-size: 16px !important;
+    }
+    .preview-container {
+        border: 2px solid #4a90e2;
+        border-radius: 10px;
+        padding: 1.5rem;
+        margin: 1rem 0;
+        background: #f8f9fa;
+        color: #2d3436;
+    }
+    .formatting-help {
+        color: #ffffff;
+        background: #404040;
+        padding: 1rem;
+        border-radius: 8px;
+        margin: 1rem 0;
+    }
+    .save-button {
+        background: #4a90e2 !important;
+        color: white !important;
+        border: none !important;
+        padding: 0.5rem 1.5rem !important;
+        border-radius: 8px !important;
+    }
+
+    /* Calendar days outside the viewed month */
+    button[data-testid="baseButton-secondary"][disabled] {
+        background-color: #f8f9fa !important;
+        border-color: #dee2e6 !important;
+        color: #9e9e9e !important;
+    }
+"""
+
+# Adds APP_CSS to the page head once; the style outlives the component
+CSS_INJECTOR = f"""
+<script>
+    const doc = window.parent.document;
+    if (!doc.getElementById('productivity-css')) {{
+        const style = doc.createElement('style');
+        style.id = 'productivity-css';
+        style.textContent = {json.dumps(APP_CSS)};
+        doc.head.appendChild(style);
+    }}
+</script>
+"""
+
+
+def format_duration(seconds):
+    hours, rem = divmod(seconds, 3600)
+    minutes, seconds = divmod(rem, 60)
+    return f"{int(hours):02d}h {int(minutes):02d}m {int(seconds):02d}s"
+
+
+# HTML fragments are memoized on their (hashable) inputs, so unchanged
+# cards are reused across reruns and sessions instead of re-formatted.
+
+@lru_cache(maxsize=4096)
+def activity_row_html(name, color, duration_info):
+    return f"""
+        <div style="padding: 0.5rem 0; border-bottom: 1px solid #eee;">
+            <div style="font-weight: 500; color: {color}">{name}</div>
+            <div style="font-size: 0.8rem; color: #666">{duration_info}</div>
+        </div>
+    """
+
+
+@lru_cache(maxsize=4096)
+def progress_html(name, color, total, duration):
+    progress = min(total / duration, 1.0)
+    return f"""
+    <div class="progress-container">
+        <div style="color: {color}; margin-bottom: 0.5rem; font-size: 1rem">
+            {name}
+        </div>
+        <div style="display: flex; align-items: center; gap: 1rem;">
+            <div style="flex-grow: 1; background: #f0f0f0; border-radius: 4px;">
+                <div style="width: {progress*100}%; 
+                          background-color: {color}; 
+                          height: 12px; 
+                          border-radius: 4px;
+                          transition: width 0.3s ease;">
+                </div>
+            </div>
+            <div style="font-size: 0.9rem; color: #666;">
+                {format_duration(total)} / {format_duration(duration)}
+            </div>
+        </div>
+    </div>
+    """
+
+
+@lru_cache(maxsize=4096)
+def activity_card_html(name, color, total):
+    return f"""
+    <div class='compact-card' style='border-color: {color}'>
+        <div>
+            <h4 style='margin: 0; color: {color}; font-size: 1.1rem'>{name}</h4>
+            <div style='margin: 0.5rem 0'>
+                <div style='font-size: 0.9rem; color: #666'>Total Time</div>
+                <div style='font-size: 1rem; font-weight: 500'>{format_duration(total)}</div>
+            </div>
+        </div>
+    </div>
+    """
+
+
+@lru_cache(maxsize=4096)
+def reminder_card_html(text, due_label, is_overdue):
+    return f"""
+    <div style="background: #f8f9fa; padding: 1rem; border-radius: 8px; margin: 0.5rem 0;
+                border-left: 4px solid {'#ef4444' if is_overdue else '#4a90e2'}">
+        <div style="{'color: #ef4444' if is_overdue else 'color: #2d3436'}">
+            {text}
+        </div>
+        <div style="color: #666; font-size: 0.9rem">
+            ⏰ Due: {due_label}
+        </div>
+    </div>
+    """
+
+
+@lru_cache(maxsize=4096)
+def upcoming_event_html(day, weekday, text, color, time_label, days_until):
+    return f"""
+        <div style="padding: 0.5rem; margin: 0.25rem 0; 
+                    background: {color};
+                    border-radius: 8px; text-align: center;">
+            <div style="font-size: 1.1rem; font-weight: 500;">{day}</div>
+            <div style="font-size: 0.8rem;">{weekday}</div>
+            <div style="font-size: 0.9rem; margin-top: 0.5rem;">{text[:15]}{'...' if len(text) >15 else ''}</div>
+            <div style="color: #666; font-size: 0.8rem">
+                {time_label}<br>
+                {days_until}d
+            </div>
+        </div>
+    """
+
+
+@lru_cache(maxsize=4096)
+def day_event_html(text, color, time_label):
+    return f"""
+        <div class="reminder-item" style="border-color: {color}">
+            <div style="font-weight: 500;">{text}</div>
+            <div style="color: #666; font-size: 0.9rem">
+                ⏰ {time_label} • {color}
+            </div>
+        </div>
+    """
+
+
+@lru_cache(maxsize=4096)
+def notebook_card_html(notebook_id, name, color, preview):
+    return f"""
+    <div class="notebook-card" style="border-left: 4px solid {color}">
+        <div style="display: flex; justify-content: space-between; align-items: center;">
+            <h3 style="margin: 0; color: {color}">{name}</h3>
+            <button onclick="window.confirmDelete('{notebook_id}')" 
+                    style="border: none; background: none; color: #ff4444;">✕</button>
+        </div>
+        <div style="color: #666; font-size: 0.9em; margin-top: 0.5rem;">
+            {preview}
+        </div>
+    </div>
+    """
+
+
+def heatmap_html(start, totals, color):
+    """GitHub-style year grid: one column per week, Monday on top."""
+    peak = max(totals, default=0) or 1
+    offset = start.weekday()
+    cells = ['<div></div>'] * offset
+    for i, total in enumerate(totals):
+        day = start + timedelta(days=i)
+        opacity = 0.08 if total <= 0 else 0.25 + 0.75 * total / peak
+        cells.append(
+            f'<div title="{day.isoformat()}: {format_duration(total)}" '
+            f'style="background: {color}; opacity: {opacity:.2f}; border-radius: 2px;"></div>'
+        )
+    return f"""
+    <div style="display: grid; grid-template-rows: repeat(7, 11px); grid-auto-flow: column;
+                grid-auto-columns: 11px; gap: 2px; overflow-x: auto; padding: 0.5rem 0;">
+        {''.join(cells)}
+    </div>
+    """
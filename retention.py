@@ -0,0 +1,46 @@
+"""Compact old activity logs into monthly summary archives.
+
+    python retention.py --keep-months 3
+    python retention.py --keep-months 12 --keep-raw --user <id>
+
+Raw entries are kept for the current month and the ``--keep-months`` full
+months before it. Older months are rolled into one gzipped summary per
+day and activity, which reports read alongside the raw entries. With
+``--keep-raw`` the compacted entries are also kept, compressed, as cold
+storage. Meant to run from cron; running it again is harmless.
+"""
+import argparse
+import sys
+from datetime import date
+
+from datastore import get_store
+
+KEEP_MONTHS = 3
+
+
+def cutoff_month(keep_months=KEEP_MONTHS, today=None):
+    """First month (``YYYY-MM``) whose raw logs are kept."""
+    today = today or date.today()
+    index = today.year * 12 + today.month - 1 - keep_months
+    return f'{index // 12:04d}-{index % 12 + 1:02d}'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--keep-months', type=int, default=KEEP_MONTHS)
+    parser.add_argument('--keep-raw', action='store_true', help="also keep compacted entries in cold storage")
+    parser.add_argument('--user', help="user namespace id in multi-user mode")
+    args = parser.parse_args(argv)
+    if args.keep_months < 0:
+        parser.error("--keep-months cannot be negative")
+
+    before = cutoff_month(args.keep_months)
+    compacted = get_store(args.user).compact_logs(before, args.keep_raw)
+    for month, count in compacted.items():
+        print(f"{month}: {count:,} entries compacted")
+    print(f"Compacted {len(compacted)} month(s) before {before}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
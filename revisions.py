@@ -0,0 +1,72 @@
+import base64
+import json
+import zlib
+from datetime import datetime
+from difflib import SequenceMatcher
+
+# A full snapshot is stored at least this often, so reading any revision
+# replays fewer than SNAPSHOT_EVERY deltas.
+SNAPSHOT_EVERY = 10
+
+
+def _encode(value):
+    return base64.b64encode(zlib.compress(json.dumps(value).encode('utf-8'))).decode('ascii')
+
+
+def _decode(data):
+    return json.loads(zlib.decompress(base64.b64decode(data)).decode('utf-8'))
+
+
+def make_delta(old, new):
+    """Line-level edit script turning ``old`` into ``new``.
+
+    Each op is either ``[start, end]`` (copy those lines of ``old``) or a
+    string of inserted text.
+    """
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    ops = []
+    matcher = SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append(''.join(new_lines[j1:j2]))
+    return ops
+
+
+def apply_delta(old, ops):
+    old_lines = old.splitlines(keepends=True)
+    return ''.join(''.join(old_lines[op[0]:op[1]]) if isinstance(op, list) else op for op in ops)
+
+
+def new_revision(notebook, previous, content):
+    """Build the next revision record for ``notebook`` from its last body.
+
+    Returns the record and the notebook metadata updated with the new
+    revision number and the number of its latest snapshot.
+    """
+    rev = notebook.get('revision', 0) + 1
+    snapshot_rev = notebook.get('snapshot_rev', 0)
+    record = {'rev': rev, 'saved': datetime.now().isoformat(), 'size': len(content)}
+    delta = make_delta(previous, content) if snapshot_rev else None
+    if delta is None or rev - snapshot_rev >= SNAPSHOT_EVERY:
+        record.update(snapshot=True, data=_encode(content))
+        snapshot_rev = rev
+    else:
+        record.update(snapshot=False, data=_encode(delta))
+    return record, {**notebook, 'revision': rev, 'snapshot_rev': snapshot_rev}
+
+
+def text_at(revisions, rev):
+    """Rebuild revision ``rev`` from its snapshot and the deltas after it.
+
+    ``revisions`` must cover the snapshot through ``rev``; the last
+    SNAPSHOT_EVERY revisions up to ``rev`` always do.
+    """
+    chain = sorted((r for r in revisions if r['rev'] <= rev), key=lambda r: r['rev'])
+    start = max(i for i, r in enumerate(chain) if r['snapshot'])
+    text = _decode(chain[start]['data'])
+    for record in chain[start + 1:]:
+        text = apply_delta(text, _decode(record['data']))
+    return text
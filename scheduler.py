@@ -0,0 +1,70 @@
+import threading
+from collections import deque
+from datetime import datetime
+
+
+class ReminderScheduler:
+    """Background thread that sleeps until the next reminder is due.
+
+    When reminders come due it marks them overdue in the store's
+    ReminderQueue and records a numbered notification. Sessions show the
+    notifications newer than the last number they have seen as toasts.
+    """
+
+    def __init__(self, store, history=100):
+        self.store = store
+        self.notifications = deque(maxlen=history)
+        self.last_seq = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._next_due = None
+        self._stopped = False
+        store.add_listener(self._on_change)
+        self._thread = threading.Thread(target=self._run, name='reminder-scheduler', daemon=True)
+        self._thread.start()
+
+    def _on_change(self, name):
+        if name is None:
+            self.stop()
+        elif name == 'reminders':
+            self._wakeup.set()
+
+    def stop(self):
+        self._stopped = True
+        self._wakeup.set()
+
+    def _run(self):
+        while not self._stopped:
+            self._wakeup.clear()
+            fired, next_due = self.store.pop_due_reminders(datetime.now())
+            with self._lock:
+                for reminder in fired:
+                    self.last_seq += 1
+                    self.notifications.append((self.last_seq, reminder))
+                self._next_due = next_due
+            timeout = None if next_due is None else max((next_due - datetime.now()).total_seconds(), 0)
+            self._wakeup.wait(timeout)
+            if self._stopped:
+                return
+
+    def next_due(self):
+        with self._lock:
+            return self._next_due
+
+    def notifications_since(self, seq):
+        with self._lock:
+            return [(n, reminder) for n, reminder in self.notifications if n > seq]
+
+
+_schedulers = {}
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler(store):
+    with _scheduler_lock:
+        # Stores evicted by get_store() have stopped their scheduler
+        for closed in [s for s in _schedulers if s.closed]:
+            del _schedulers[closed]
+        if store not in _schedulers:
+            _schedulers[store] = ReminderScheduler(store)
+        return _schedulers[store]
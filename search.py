@@ -0,0 +1,138 @@
+import json
+import os
+import re
+from bisect import bisect_left, insort
+
+from storage import atomic_write_json
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return {token.lower() for token in TOKEN_RE.findall(text or '')}
+
+
+class SearchIndex:
+    """Inverted index over notebook, reminder and calendar event text.
+
+    Documents are keyed ``kind:id``. ``postings`` maps a token to the keys
+    containing it and ``terms`` keeps the tokens sorted so a prefix query
+    is a bisect range. The index persists as a snapshot plus an append-only
+    journal of changes that is folded back into the snapshot once it grows
+    larger than the index itself.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.docs = {}
+        self.postings = {}
+        self.terms = []
+        self._journal_lines = 0
+
+    @classmethod
+    def open(cls, directory):
+        index = cls(directory)
+        snapshot = os.path.join(directory, 'snapshot.json')
+        if os.path.exists(snapshot):
+            with open(snapshot, 'r') as f:
+                for key, doc in json.load(f).items():
+                    index._add(key, doc)
+        journal = os.path.join(directory, 'journal.jsonl')
+        if os.path.exists(journal):
+            with open(journal, 'r') as f:
+                for line in f:
+                    try:
+                        change = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    index._remove(change['key'])
+                    if change['doc'] is not None:
+                        index._add(change['key'], change['doc'])
+                    index._journal_lines += 1
+        return index
+
+    def _add(self, key, doc):
+        self.docs[key] = doc
+        for token in doc['tokens']:
+            if token not in self.postings:
+                self.postings[token] = set()
+                insort(self.terms, token)
+            self.postings[token].add(key)
+
+    def _remove(self, key):
+        doc = self.docs.pop(key, None)
+        if doc is None:
+            return
+        for token in doc['tokens']:
+            keys = self.postings[token]
+            keys.discard(key)
+            if not keys:
+                del self.postings[token]
+                del self.terms[bisect_left(self.terms, token)]
+
+    def _persist(self, key, doc):
+        if self.directory is None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        if self._journal_lines >= max(len(self.docs), 100):
+            self.save()
+            return
+        with open(os.path.join(self.directory, 'journal.jsonl'), 'a') as f:
+            f.write(json.dumps({'key': key, 'doc': doc}) + '\n')
+        self._journal_lines += 1
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        atomic_write_json(os.path.join(self.directory, 'snapshot.json'), self.docs)
+        with open(os.path.join(self.directory, 'journal.jsonl'), 'w'):
+            pass
+        self._journal_lines = 0
+
+    def put(self, kind, doc_id, title, text, snippet='', version=None):
+        key = f'{kind}:{doc_id}'
+        doc = {
+            'kind': kind,
+            'id': doc_id,
+            'title': title,
+            'snippet': snippet,
+            'tokens': sorted(tokenize(f'{title} {text}')),
+        }
+        # Callers can tell from ``version`` whether the text needs re-reading
+        if version is not None:
+            doc['version'] = version
+        if self.docs.get(key) == doc:
+            return
+        self._remove(key)
+        self._add(key, doc)
+        self._persist(key, doc)
+
+    def delete(self, kind, doc_id):
+        key = f'{kind}:{doc_id}'
+        if key in self.docs:
+            self._remove(key)
+            self._persist(key, None)
+
+    def keys(self, kind):
+        return {doc['id'] for doc in self.docs.values() if doc['kind'] == kind}
+
+    def _prefix_matches(self, prefix):
+        matches = set()
+        i = bisect_left(self.terms, prefix)
+        while i < len(self.terms) and self.terms[i].startswith(prefix):
+            matches |= self.postings[self.terms[i]]
+            i += 1
+        return matches
+
+    def search(self, query, limit=20):
+        """Documents containing every query word, each matched as a prefix."""
+        tokens = sorted(tokenize(query), key=len, reverse=True)
+        if not tokens:
+            return []
+        keys = None
+        for token in tokens:
+            matches = self._prefix_matches(token)
+            keys = matches if keys is None else keys & matches
+            if not keys:
+                return []
+        results = sorted((self.docs[key] for key in keys), key=lambda doc: (doc['kind'], doc['title'].lower()))
+        return results[:limit]
@@ -0,0 +1,1001 @@
+import gzip
+import json
+import os
+import sqlite3
+import tempfile
+import shutil
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+
+import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+DATA_DIR = 'data'
+COLLECTIONS = ('activities', 'reminders', 'calendar_events', 'notes', 'logs')
+
+DEFAULT_ACTIVITIES = {
+    'gym': {'name': '🏋 Gym', 'duration': None, 'color': '#4a90e2'},
+    'study': {'name': '📚 Study', 'duration': None, 'color': '#00cec9'},
+    'shower': {'name': '🚿 Shower', 'duration': None, 'color': '#fd79a8'},
+    'cycle': {'name': '🚴 Leisure', 'duration': 3*3600, 'color': '#fdcb6e'},
+    'course': {'name': '💻 Course', 'duration': 2*3600, 'color': '#6c5ce7'}
+}
+
+
+def default_activities():
+    return {key: dict(act) for key, act in DEFAULT_ACTIVITIES.items()}
+
+
+def empty_collection(name):
+    return {} if name == 'activities' else []
+
+
+class FileLock:
+    """Re-entrant lock shared by threads in this process and, through
+    ``flock`` on a lock file, by other processes using the same directory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    def __enter__(self):
+        self._lock.acquire()
+        if self._depth == 0 and fcntl is not None:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self._depth -= 1
+        if self._depth == 0 and self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+        self._lock.release()
+
+
+def _fsync_directory(directory):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path, text):
+    """Write text (or bytes) to a temp file, fsync it and rename it over ``path``.
+
+    A crash mid-write leaves the previous file untouched instead of a
+    truncated one.
+    """
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(prefix=f'.{os.path.basename(path)}.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb' if isinstance(text, bytes) else 'w') as f:
+            f.write(text)
+            metrics.add_bytes('written', len(text))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    _fsync_directory(directory)
+
+
+def atomic_write_json(path, data):
+    atomic_write(path, json.dumps(data, default=str))
+
+
+def split_note(notebook):
+    """Separate a notebook's body from the metadata kept in the notes index."""
+    meta = {k: v for k, v in notebook.items() if k != 'content'}
+    content = notebook.get('content') or ''
+    meta['preview'] = content[:50]
+    return meta, content
+
+
+def _append_lines(path, lines):
+    with open(path, 'a') as f:
+        f.writelines(lines)
+        if metrics.ENABLED:
+            metrics.add_bytes('written', sum(len(line) for line in lines))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class LogJournal:
+    """Append-only JSONL journal of activity logs, one segment per month.
+
+    Segments are named ``YYYY-MM.jsonl`` after the log date. Recording a
+    session appends exactly one line; readers stream the segments lazily
+    and skip a torn last line left behind by a crash.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def exists(self):
+        return os.path.isdir(self.directory)
+
+    def segments(self):
+        if not self.exists():
+            return []
+        return sorted(f for f in os.listdir(self.directory) if f.endswith('.jsonl'))
+
+    def signature(self):
+        # A missing directory reads the same as an empty one, so the first
+        # load creating it does not look like a change
+        if not self.exists():
+            return ()
+        signature = []
+        for segment in self.segments():
+            stat = os.stat(os.path.join(self.directory, segment))
+            signature.append((segment, stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def append(self, entries):
+        os.makedirs(self.directory, exist_ok=True)
+        by_segment = {}
+        for entry in entries:
+            segment = f"{entry['date'][:7]}.jsonl"
+            by_segment.setdefault(segment, []).append(json.dumps(entry) + '\n')
+        for segment, lines in by_segment.items():
+            _append_lines(os.path.join(self.directory, segment), lines)
+
+    def segment_path(self, month):
+        return os.path.join(self.directory, f'{month}.jsonl')
+
+    def segment_stat(self, month):
+        try:
+            stat = os.stat(self.segment_path(month))
+        except FileNotFoundError:
+            return None
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def read_segment(self, month):
+        with open(self.segment_path(month), 'r') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+            metrics.add_bytes('read', os.fstat(f.fileno()).st_size)
+
+    def iter_records(self, start_month=None, skip=()):
+        for segment in self.segments():
+            month = segment[:7]
+            if (start_month and month < start_month) or month in skip:
+                continue
+            yield from self.read_segment(month)
+
+    def __iter__(self):
+        return self.iter_records()
+
+    def clear(self):
+        for segment in self.segments():
+            os.remove(os.path.join(self.directory, segment))
+        os.makedirs(self.directory, exist_ok=True)
+
+
+def summarize_logs(logs):
+    """Collapse logs into one entry per day and activity.
+
+    A summary keeps the fields reports read, with ``duration`` the day's total
+    and ``completed`` set if any session met its target, so it can stand in
+    for the entries it replaces. ``sessions`` counts those entries.
+    """
+    days = {}
+    for log in logs:
+        key = (log['date'], log.get('activity_id') or log.get('activity'))
+        if key not in days:
+            days[key] = {
+                'activity_id': log.get('activity_id'),
+                'activity': log.get('activity', ''),
+                'date': log['date'],
+                'duration': 0.0,
+                'completed': False,
+                'sessions': 0,
+            }
+        summary = days[key]
+        summary['duration'] += log['duration']
+        summary['completed'] = summary['completed'] or bool(log['completed'])
+        summary['sessions'] += log.get('sessions', 1)
+    return sorted(days.values(), key=lambda summary: summary['date'])
+
+
+class LogArchive:
+    """Compacted months of logs as gzipped summaries, ``YYYY-MM.json.gz``.
+
+    Each archive records the size and mtime of the journal segment it was
+    built from, so a segment left behind by an interrupted compaction is
+    recognised as already archived rather than counted twice. Raw entries
+    kept as cold storage go to ``raw/YYYY-MM.jsonl.gz``.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def months(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(f[:7] for f in os.listdir(self.directory) if f.endswith('.json.gz'))
+
+    def path(self, month):
+        return os.path.join(self.directory, f'{month}.json.gz')
+
+    def signature(self):
+        signature = []
+        for month in self.months():
+            stat = os.stat(self.path(month))
+            signature.append((month, stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def read(self, month):
+        try:
+            with open(self.path(month), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        metrics.add_bytes('read', len(data))
+        return json.loads(gzip.decompress(data))
+
+    def write(self, month, summaries, source):
+        os.makedirs(self.directory, exist_ok=True)
+        data = json.dumps({'summaries': summaries, 'source': source}).encode('utf-8')
+        atomic_write(self.path(month), gzip.compress(data))
+
+    def keep_raw(self, month, segment_path):
+        # Each compaction of a month adds one more gzip member to its file
+        directory = os.path.join(self.directory, 'raw')
+        os.makedirs(directory, exist_ok=True)
+        with open(segment_path, 'rb') as f:
+            data = gzip.compress(f.read())
+        with open(os.path.join(directory, f'{month}.jsonl.gz'), 'ab') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        metrics.add_bytes('written', len(data))
+
+    def clear(self):
+        if os.path.isdir(self.directory):
+            shutil.rmtree(self.directory)
+
+
+def legacy_log_file(data_dir):
+    """Whole-file log history to import when no journal exists yet."""
+    for filename in ('logs.json', 'activity_log.json'):
+        path = os.path.join(data_dir, filename)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def read_legacy_logs(data_dir):
+    journal = LogJournal(os.path.join(data_dir, 'logs'))
+    if journal.exists():
+        return list(JsonStorage(data_dir).iter_logs())
+    path = legacy_log_file(data_dir)
+    if path is None:
+        return []
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+class JsonStorage:
+    """One JSON file per collection, with logs kept in a LogJournal.
+
+    Changes are applied to an in-memory copy and the collection is marked
+    dirty; only dirty collections are written, each with an atomic replace.
+    New logs are appended to the journal instead of rewriting the history.
+    Inside ``batch()`` the flush is deferred until the outermost block exits.
+
+    Every read-modify-write holds a FileLock and re-reads a collection whose
+    file changed since it was cached, so concurrent processes writing the
+    same directory cannot overwrite each other's changes.
+
+    Months compacted by ``compact_logs`` move from the journal to a
+    LogArchive; the logs collection reads the archived summaries followed
+    by the raw entries.
+    """
+
+    def __init__(self, data_dir=DATA_DIR):
+        self.data_dir = data_dir
+        os.makedirs(data_dir, exist_ok=True)
+        self._lock = FileLock(os.path.join(data_dir, '.lock'))
+        self._collections = {}
+        self._signatures = {}
+        self._dirty = set()
+        self._pending_logs = []
+        self._batch_depth = 0
+        # note id -> (inode, bytes indexed, revision numbers, their line offsets)
+        self._revision_offsets = {}
+        self.journal = LogJournal(os.path.join(data_dir, 'logs'))
+        self.archive = LogArchive(os.path.join(data_dir, 'archive'))
+
+    def path(self, name):
+        return os.path.join(self.data_dir, f'{name}.json')
+
+    def signature(self, name):
+        if name == 'logs':
+            return (self.archive.signature(), self.journal.signature())
+        try:
+            stat = os.stat(self.path(name))
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _ensure_journal(self):
+        if self.journal.exists():
+            return
+        path = legacy_log_file(self.data_dir)
+        if path:
+            with open(path, 'r') as f:
+                self.journal.append(json.load(f))
+        os.makedirs(self.journal.directory, exist_ok=True)
+
+    def _read(self, name):
+        path = self.path(name)
+        if not os.path.exists(path):
+            return default_activities() if name == 'activities' else empty_collection(name)
+        with open(path, 'r') as f:
+            data = json.load(f)
+            metrics.add_bytes('read', os.fstat(f.fileno()).st_size)
+        if name == 'notes' and any('content' in notebook for notebook in data):
+            data = self._split_note_bodies(data)
+        return data
+
+    def _split_note_bodies(self, notes):
+        # Older notes.json files hold full bodies; move them to blob files
+        index = []
+        for notebook in notes:
+            meta, content = split_note(notebook)
+            self.save_note_body(meta['id'], content)
+            index.append(meta)
+        atomic_write_json(self.path('notes'), index)
+        return index
+
+    def _body_path(self, note_id):
+        return os.path.join(self.data_dir, 'notes', f'{note_id}.md')
+
+    def load_note_body(self, note_id):
+        try:
+            with open(self._body_path(note_id), 'r') as f:
+                content = f.read()
+                metrics.add_bytes('read', len(content))
+                return content
+        except FileNotFoundError:
+            return ''
+
+    def save_note_body(self, note_id, content):
+        with self._lock:
+            os.makedirs(os.path.join(self.data_dir, 'notes'), exist_ok=True)
+            atomic_write(self._body_path(note_id), content)
+
+    def delete_note_body(self, note_id):
+        with self._lock:
+            try:
+                os.remove(self._body_path(note_id))
+            except FileNotFoundError:
+                pass
+
+    def _revisions_path(self, note_id):
+        return os.path.join(self.data_dir, 'revisions', f'{note_id}.jsonl')
+
+    def append_note_revision(self, note_id, revision):
+        with self._lock:
+            os.makedirs(os.path.join(self.data_dir, 'revisions'), exist_ok=True)
+            _append_lines(self._revisions_path(note_id), [json.dumps(revision) + '\n'])
+
+    def _revision_index(self, note_id, f):
+        """Revision numbers in ``f`` and the offsets of their lines.
+
+        Revisions are appended in order, so only lines added since the last
+        call are parsed; a replaced or truncated file is indexed afresh.
+        """
+        stat = os.fstat(f.fileno())
+        cached = self._revision_offsets.get(note_id)
+        if cached is None or cached[0] != stat.st_ino or cached[1] > stat.st_size:
+            cached = (stat.st_ino, 0, [], [])
+        inode, indexed, revs, offsets = cached
+        if indexed < stat.st_size:
+            revs, offsets = list(revs), list(offsets)
+            f.seek(indexed)
+            for line in f:
+                # A line still being written is indexed once it is complete
+                if not line.endswith(b'\n'):
+                    break
+                metrics.add_bytes('read', len(line))
+                try:
+                    revs.append(json.loads(line)['rev'])
+                    offsets.append(indexed)
+                except json.JSONDecodeError:
+                    pass
+                indexed += len(line)
+            self._revision_offsets[note_id] = (inode, indexed, revs, offsets)
+        return revs, offsets
+
+    def load_note_revisions(self, note_id, start=1, end=None):
+        revisions = []
+        try:
+            with open(self._revisions_path(note_id), 'rb') as f:
+                revs, offsets = self._revision_index(note_id, f)
+                first = bisect_left(revs, start)
+                if first == len(revs):
+                    return revisions
+                f.seek(offsets[first])
+                for line in f:
+                    metrics.add_bytes('read', len(line))
+                    try:
+                        revision = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if end is not None and revision['rev'] > end:
+                        break
+                    revisions.append(revision)
+        except FileNotFoundError:
+            pass
+        return revisions
+
+    def delete_note_revisions(self, note_id):
+        with self._lock:
+            try:
+                os.remove(self._revisions_path(note_id))
+            except FileNotFoundError:
+                pass
+            self._revision_offsets.pop(note_id, None)
+
+    def _collection(self, name):
+        if name not in self._dirty:
+            signature = self.signature(name)
+            if name not in self._collections or self._signatures[name] != signature:
+                self._collections[name] = self._read(name)
+                self._signatures[name] = signature
+        return self._collections[name]
+
+    def load(self, name):
+        with self._lock:
+            if name == 'logs':
+                # Logs are not cached here; the DataStore keeps them as a LogTable
+                self._ensure_journal()
+                return list(self._iter_logs()) + self._pending_logs
+            data = self._collection(name)
+            return dict(data) if name == 'activities' else list(data)
+
+    def _mark_dirty(self, name):
+        self._dirty.add(name)
+        if not self._batch_depth:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            for name in sorted(self._dirty):
+                if name == 'logs':
+                    self.journal.append(self._pending_logs)
+                    self._pending_logs = []
+                else:
+                    atomic_write_json(self.path(name), self._collections[name])
+                self._signatures[name] = self.signature(name)
+            self._dirty.clear()
+
+    @contextmanager
+    def batch(self):
+        with self._lock:
+            self._batch_depth += 1
+            try:
+                yield
+            except BaseException:
+                self._batch_depth -= 1
+                if not self._batch_depth:
+                    # Drop unflushed changes so the files stay authoritative
+                    for name in self._dirty:
+                        self._collections.pop(name, None)
+                    self._dirty.clear()
+                    self._pending_logs = []
+                raise
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                self.flush()
+
+    def iter_logs(self, start_month=None):
+        with self._lock:
+            self._ensure_journal()
+        return self._iter_logs(start_month)
+
+    def _iter_logs(self, start_month=None):
+        archived = set()
+        for month in self.archive.months():
+            if start_month and month < start_month:
+                continue
+            archive = self.archive.read(month)
+            if archive['source'] == self.journal.segment_stat(month):
+                archived.add(month)
+            yield from archive['summaries']
+        yield from self.journal.iter_records(start_month, skip=archived)
+
+    def log_months(self):
+        with self._lock:
+            self._ensure_journal()
+            return [segment[:7] for segment in self.journal.segments()]
+
+    def compact_logs(self, month, keep_raw=False):
+        """Replace a month's journal segment with its archived summaries.
+
+        Returns the number of raw entries compacted.
+        """
+        with self._lock:
+            source = self.journal.segment_stat(month)
+            if source is None:
+                return 0
+            existing = self.archive.read(month)
+            count = 0
+            if existing is None or existing['source'] != source:
+                raw = list(self.journal.read_segment(month))
+                count = len(raw)
+                if keep_raw:
+                    self.archive.keep_raw(month, self.journal.segment_path(month))
+                previous = existing['summaries'] if existing else []
+                self.archive.write(month, summarize_logs(previous + raw), source)
+            os.remove(self.journal.segment_path(month))
+            return count
+
+    def put(self, name, record_id, record):
+        with self._lock:
+            data = self._collection(name)
+            if name == 'activities':
+                data[record_id] = record
+            else:
+                for i, existing in enumerate(data):
+                    if existing.get('id') == record_id:
+                        data[i] = record
+                        break
+                else:
+                    data.append(record)
+            self._mark_dirty(name)
+
+    def put_many(self, name, records):
+        """Insert or replace many records with one id lookup and one write."""
+        with self._lock:
+            data = self._collection(name)
+            positions = {r.get('id'): i for i, r in enumerate(data)}
+            for record in records:
+                i = positions.get(record['id'])
+                if i is None:
+                    positions[record['id']] = len(data)
+                    data.append(record)
+                else:
+                    data[i] = record
+            self._mark_dirty(name)
+
+    def delete(self, name, record_id):
+        with self._lock:
+            data = self._collection(name)
+            if name == 'activities':
+                data.pop(record_id, None)
+            else:
+                data[:] = [r for r in data if r.get('id') != record_id]
+            self._mark_dirty(name)
+
+    def append_log(self, entry):
+        with self._lock:
+            self._pending_logs.append(entry)
+            self._mark_dirty('logs')
+
+    def append_logs(self, entries):
+        """Append a chunk of logs straight to the journal in one write per segment."""
+        with self._lock:
+            self._ensure_journal()
+            self.journal.append(self._pending_logs + list(entries))
+            self._pending_logs = []
+            self._dirty.discard('logs')
+
+    def clear(self):
+        with self._lock:
+            for name in COLLECTIONS:
+                try:
+                    os.remove(self.path(name))
+                except FileNotFoundError:
+                    pass
+            # An empty journal keeps legacy history from being imported again
+            self.journal.clear()
+            self.archive.clear()
+            for subdir in ('notes', 'revisions'):
+                path = os.path.join(self.data_dir, subdir)
+                if os.path.isdir(path):
+                    for filename in os.listdir(path):
+                        os.remove(os.path.join(path, filename))
+            self._revision_offsets.clear()
+            self._collections.clear()
+            self._signatures.clear()
+            self._dirty.clear()
+            self._pending_logs = []
+
+    def close(self):
+        self.flush()
+
+
+def _archived_summaries(rows):
+    summaries = []
+    for (data,) in rows:
+        metrics.add_bytes('read', len(data))
+        summaries.extend(json.loads(gzip.decompress(data)))
+    return summaries
+
+
+def _counted(rows):
+    for row in rows:
+        metrics.add_bytes('read', len(row[1]))
+        yield row
+
+
+class SqliteStorage:
+    """SQLite database in WAL mode with one table per collection.
+
+    Every change touches only its own row, so a write costs the same no matter
+    how many logs or notes are stored. Existing ``data/*.json`` files are
+    imported the first time the database is opened.
+    """
+
+    RECORD_TABLES = ('activities', 'reminders', 'calendar_events', 'notes')
+
+    def __init__(self, path=None, data_dir=DATA_DIR):
+        self.data_dir = data_dir
+        self.path = path or os.path.join(data_dir, 'productivity.db')
+        self._lock = threading.RLock()
+        self._generation = dict.fromkeys(COLLECTIONS, 0)
+        self._batch_depth = 0
+        os.makedirs(data_dir, exist_ok=True)
+        # Other processes may hold the write lock briefly; wait rather than fail
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._create_schema()
+        self._migrate_json()
+        self._split_note_bodies()
+
+    def _create_schema(self):
+        with self._lock:
+            for table in self.RECORD_TABLES:
+                self._conn.execute(
+                    f'CREATE TABLE IF NOT EXISTS {table} (id TEXT PRIMARY KEY, data TEXT NOT NULL)'
+                )
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS logs ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, date TEXT NOT NULL, data TEXT NOT NULL)'
+            )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS logs_date ON logs (date)')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS note_bodies (id TEXT PRIMARY KEY, content TEXT NOT NULL)'
+            )
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS note_revisions ('
+                'note_id TEXT NOT NULL, rev INTEGER NOT NULL, saved TEXT NOT NULL, size INTEGER NOT NULL, '
+                'snapshot INTEGER NOT NULL, data TEXT NOT NULL, PRIMARY KEY (note_id, rev))'
+            )
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS log_archive (month TEXT PRIMARY KEY, data BLOB NOT NULL)'
+            )
+            self._conn.execute('CREATE TABLE IF NOT EXISTS log_cold (month TEXT NOT NULL, data BLOB NOT NULL)')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+
+    def signature(self, name):
+        """Change marker for a collection.
+
+        ``data_version`` moves when another connection commits; the in-process
+        generation counter covers writes made through this connection.
+        """
+        with self._lock:
+            data_version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+            return (data_version, self._generation[name])
+
+    def _meta(self, key):
+        row = self._conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def _migrate_json(self):
+        with self._lock:
+            if self._meta('migrated'):
+                return
+            legacy = JsonStorage(self.data_dir)
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                # Another process may have migrated while this one waited for the lock
+                if self._meta('migrated'):
+                    self._conn.execute('ROLLBACK')
+                    return
+                activities = legacy.load('activities')
+                for key, activity in activities.items():
+                    self._put('activities', key, activity)
+                for name in ('reminders', 'calendar_events'):
+                    for record in legacy.load(name):
+                        self._put(name, record['id'], record)
+                notes = []
+                if os.path.exists(legacy.path('notes')):
+                    with open(legacy.path('notes'), 'r') as f:
+                        notes = json.load(f)
+                for notebook in notes:
+                    meta, content = split_note(notebook)
+                    if 'content' not in notebook:
+                        content = legacy.load_note_body(meta['id'])
+                    self._put('notes', meta['id'], meta)
+                    self._put_body(meta['id'], content)
+                self._conn.executemany(
+                    'INSERT INTO logs (date, data) VALUES (?, ?)',
+                    ((log['date'], json.dumps(log)) for log in read_legacy_logs(self.data_dir))
+                )
+                self._conn.execute("INSERT INTO meta (key, value) VALUES ('migrated', '1')")
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def _split_note_bodies(self):
+        # Databases created before bodies had their own table keep them inline
+        with self._lock:
+            if self._meta('notes_split'):
+                return
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                if self._meta('notes_split'):
+                    self._conn.execute('ROLLBACK')
+                    return
+                for note_id, data in list(self._conn.execute('SELECT id, data FROM notes')):
+                    notebook = json.loads(data)
+                    if 'content' in notebook:
+                        meta, content = split_note(notebook)
+                        self._put('notes', note_id, meta)
+                        self._put_body(note_id, content)
+                self._conn.execute("INSERT INTO meta (key, value) VALUES ('notes_split', '1')")
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def load(self, name):
+        with self._lock:
+            if name == 'logs':
+                rows = self._conn.execute('SELECT NULL, data FROM logs ORDER BY id')
+            else:
+                rows = self._conn.execute(f'SELECT id, data FROM {name} ORDER BY rowid')
+            if metrics.ENABLED:
+                rows = _counted(rows)
+            if name == 'activities':
+                return {key: json.loads(data) for key, data in rows}
+            records = [json.loads(data) for _, data in rows]
+            if name == 'logs':
+                archived = self._conn.execute('SELECT data FROM log_archive ORDER BY month')
+                return _archived_summaries(archived) + records
+            return records
+
+    @contextmanager
+    def batch(self):
+        """Group several row changes into one transaction and one WAL sync."""
+        with self._lock:
+            if not self._batch_depth:
+                self._conn.execute('BEGIN IMMEDIATE')
+            self._batch_depth += 1
+            try:
+                yield
+            except BaseException:
+                self._batch_depth -= 1
+                if not self._batch_depth:
+                    self._conn.execute('ROLLBACK')
+                raise
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                self._conn.execute('COMMIT')
+
+    def iter_logs(self, start_month=None):
+        # A separate cursor so a long stream does not hold the lock
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            archived = conn.execute(
+                'SELECT data FROM log_archive WHERE month >= ? ORDER BY month', (start_month or '',)
+            )
+            yield from _archived_summaries(archived)
+            query = 'SELECT data FROM logs'
+            params = ()
+            if start_month:
+                query += ' WHERE date >= ?'
+                params = (start_month,)
+            for (data,) in conn.execute(query + ' ORDER BY id', params):
+                yield json.loads(data)
+        finally:
+            conn.close()
+
+    def log_months(self):
+        with self._lock:
+            rows = self._conn.execute('SELECT DISTINCT substr(date, 1, 7) FROM logs ORDER BY 1')
+            return [month for (month,) in rows]
+
+    def compact_logs(self, month, keep_raw=False):
+        """Fold a month of logs into its archived summaries in one transaction.
+
+        Returns the number of raw entries compacted.
+        """
+        bounds = (f'{month}-00', f'{month}-99')
+        with self._lock, self.batch():
+            rows = self._conn.execute(
+                'SELECT data FROM logs WHERE date >= ? AND date <= ? ORDER BY id', bounds
+            ).fetchall()
+            if not rows:
+                return 0
+            raw = [json.loads(data) for (data,) in rows]
+            existing = self._conn.execute('SELECT data FROM log_archive WHERE month = ?', (month,))
+            summaries = summarize_logs(_archived_summaries(existing) + raw)
+            self._conn.execute(
+                'INSERT INTO log_archive (month, data) VALUES (?, ?) '
+                'ON CONFLICT(month) DO UPDATE SET data = excluded.data',
+                (month, gzip.compress(json.dumps(summaries).encode('utf-8')))
+            )
+            if keep_raw:
+                cold = ''.join(data + '\n' for (data,) in rows).encode('utf-8')
+                self._conn.execute('INSERT INTO log_cold (month, data) VALUES (?, ?)', (month, gzip.compress(cold)))
+            self._conn.execute('DELETE FROM logs WHERE date >= ? AND date <= ?', bounds)
+            self._generation['logs'] += 1
+            return len(raw)
+
+    def _put(self, name, record_id, record):
+        data = json.dumps(record, default=str)
+        metrics.add_bytes('written', len(data))
+        self._conn.execute(
+            f'INSERT INTO {name} (id, data) VALUES (?, ?) '
+            'ON CONFLICT(id) DO UPDATE SET data = excluded.data',
+            (record_id, data)
+        )
+
+    def put(self, name, record_id, record):
+        with self._lock:
+            self._put(name, record_id, record)
+            self._generation[name] += 1
+
+    def _put_body(self, note_id, content):
+        self._conn.execute(
+            'INSERT INTO note_bodies (id, content) VALUES (?, ?) '
+            'ON CONFLICT(id) DO UPDATE SET content = excluded.content',
+            (note_id, content)
+        )
+
+    def load_note_body(self, note_id):
+        with self._lock:
+            row = self._conn.execute('SELECT content FROM note_bodies WHERE id = ?', (note_id,)).fetchone()
+            content = row[0] if row else ''
+            metrics.add_bytes('read', len(content))
+            return content
+
+    def save_note_body(self, note_id, content):
+        with self._lock:
+            self._put_body(note_id, content)
+
+    def delete_note_body(self, note_id):
+        with self._lock:
+            self._conn.execute('DELETE FROM note_bodies WHERE id = ?', (note_id,))
+
+    def append_note_revision(self, note_id, revision):
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO note_revisions (note_id, rev, saved, size, snapshot, data) VALUES (?, ?, ?, ?, ?, ?)',
+                (note_id, revision['rev'], revision['saved'], revision['size'],
+                 int(revision['snapshot']), revision['data'])
+            )
+
+    def load_note_revisions(self, note_id, start=1, end=None):
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT rev, saved, size, snapshot, data FROM note_revisions '
+                'WHERE note_id = ? AND rev >= ? AND rev <= ? ORDER BY rev',
+                (note_id, start, end if end is not None else 2**62)
+            )
+            return [
+                {'rev': rev, 'saved': saved, 'size': size, 'snapshot': bool(snapshot), 'data': data}
+                for rev, saved, size, snapshot, data in rows
+            ]
+
+    def delete_note_revisions(self, note_id):
+        with self._lock:
+            self._conn.execute('DELETE FROM note_revisions WHERE note_id = ?', (note_id,))
+
+    def put_many(self, name, records):
+        rows = [(record['id'], json.dumps(record, default=str)) for record in records]
+        if metrics.ENABLED:
+            metrics.add_bytes('written', sum(len(data) for _, data in rows))
+        with self._lock, self.batch():
+            self._conn.executemany(
+                f'INSERT INTO {name} (id, data) VALUES (?, ?) '
+                'ON CONFLICT(id) DO UPDATE SET data = excluded.data',
+                rows
+            )
+            self._generation[name] += 1
+
+    def delete(self, name, record_id):
+        with self._lock:
+            self._conn.execute(f'DELETE FROM {name} WHERE id = ?', (record_id,))
+            self._generation[name] += 1
+
+    def append_log(self, entry):
+        data = json.dumps(entry)
+        metrics.add_bytes('written', len(data))
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO logs (date, data) VALUES (?, ?)',
+                (entry['date'], data)
+            )
+            self._generation['logs'] += 1
+
+    def append_logs(self, entries):
+        rows = [(entry['date'], json.dumps(entry)) for entry in entries]
+        if metrics.ENABLED:
+            metrics.add_bytes('written', sum(len(data) for _, data in rows))
+        with self._lock, self.batch():
+            self._conn.executemany('INSERT INTO logs (date, data) VALUES (?, ?)', rows)
+            self._generation['logs'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            for table in self.RECORD_TABLES + ('logs', 'log_archive', 'log_cold', 'note_bodies', 'note_revisions'):
+                self._conn.execute(f'DELETE FROM {table}')
+            for key, activity in default_activities().items():
+                self._put('activities', key, activity)
+            self._conn.execute('COMMIT')
+            for name in COLLECTIONS:
+                self._generation[name] += 1
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+BACKENDS = {
+    'json': JsonStorage,
+    'sqlite': SqliteStorage,
+}
+
+_storages = {}
+_storage_lock = threading.Lock()
+
+
+def namespace_dir(namespace=None):
+    """Data directory for a user namespace; ``None`` is the shared default."""
+    if namespace is None:
+        return DATA_DIR
+    return os.path.join(DATA_DIR, 'users', namespace)
+
+
+def get_storage(namespace=None):
+    """Return the process-wide storage backend chosen by PRODUCTIVITY_STORAGE."""
+    with _storage_lock:
+        if namespace not in _storages:
+            backend = os.environ.get('PRODUCTIVITY_STORAGE', 'sqlite')
+            if backend not in BACKENDS:
+                raise ValueError(f"Unknown storage backend: {backend}")
+            storage = BACKENDS[backend](data_dir=namespace_dir(namespace))
+            _storages[namespace] = metrics.instrument_storage(storage)
+        return _storages[namespace]
+
+
+def close_storage(namespace=None):
+    """Close a namespace's backend; the next ``get_storage`` opens it again."""
+    with _storage_lock:
+        storage = _storages.pop(namespace, None)
+    if storage is not None:
+        storage.close()
@@ -0,0 +1,58 @@
+import pytest
+
+pd = pytest.importorskip('pandas')
+
+from analytics import LogFrameCache, build_log_frame  # noqa: E402
+from models import LogTable  # noqa: E402
+
+ACTIVITIES = {'gym': {'name': 'Gym', 'duration': 3600}}
+
+
+def log(day, duration):
+    return {'activity_id': 'gym', 'activity': 'Gym', 'date': day, 'duration': duration, 'completed': False}
+
+
+def test_frame_ignores_a_row_still_being_appended():
+    logs = LogTable([log('2026-10-17', 60.0)])
+    # A concurrent append that has only reached the first columns
+    logs.date.append(logs.dates.code('2026-10-18'))
+    logs.activity.append(0)
+    logs.duration.append(30.0)
+    frame = build_log_frame(logs, ACTIVITIES)
+    assert len(frame) == 1
+    assert frame['duration'].tolist() == [60.0]
+
+
+def test_cache_extends_by_rows_it_read():
+    logs = LogTable([log('2026-10-17', 60.0)])
+    cache = LogFrameCache()
+    assert len(cache.frame(logs, ACTIVITIES)) == 1
+    logs.append(log('2026-10-18', 30.0))
+    frame = cache.frame(logs, ACTIVITIES)
+    assert frame['duration'].tolist() == [60.0, 30.0]
+
+
+def test_weeks_run_monday_to_sunday():
+    from analytics import FREQUENCIES, activity_totals, target_hit_rates
+
+    # Sunday 2026-10-11, Monday 2026-10-12 and Sunday 2026-10-18
+    logs = LogTable([log('2026-10-11', 100.0), log('2026-10-12', 3600.0), log('2026-10-18', 10.0)])
+    frame = build_log_frame(logs, ACTIVITIES)
+    totals = activity_totals(frame, FREQUENCIES['Weekly'])
+    assert totals['gym'].to_dict() == {
+        pd.Timestamp('2026-10-05'): 100.0,
+        pd.Timestamp('2026-10-12'): 3610.0,
+    }
+    rates = target_hit_rates(frame, ACTIVITIES, FREQUENCIES['Weekly'])
+    assert rates['gym'].to_dict() == {pd.Timestamp('2026-10-05'): 0.0, pd.Timestamp('2026-10-12'): 0.5}
+
+
+def test_daily_and_monthly_periods():
+    from analytics import FREQUENCIES, activity_totals
+
+    logs = LogTable([log('2026-09-30', 5.0), log('2026-10-01', 7.0), log('2026-10-31', 1.0)])
+    frame = build_log_frame(logs, ACTIVITIES)
+    monthly = activity_totals(frame, FREQUENCIES['Monthly'])
+    assert monthly['gym'].to_dict() == {pd.Timestamp('2026-09-01'): 5.0, pd.Timestamp('2026-10-01'): 8.0}
+    daily = activity_totals(frame, FREQUENCIES['Daily'], start='2026-10-01', end='2026-10-01')
+    assert daily['gym'].to_dict() == {pd.Timestamp('2026-10-01'): 7.0}
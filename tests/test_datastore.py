@@ -0,0 +1,101 @@
+import sqlite3
+import threading
+
+import pytest
+
+import datastore
+import storage as storage_module
+from datastore import DataStore, get_store
+from scheduler import get_scheduler
+from storage import JsonStorage, SqliteStorage
+
+
+@pytest.mark.parametrize('backend', [JsonStorage, SqliteStorage])
+def test_write_behind_does_not_reload_its_own_writes(tmp_path, backend):
+    storage = backend(data_dir=str(tmp_path / 'data'))
+    store = DataStore(storage, write_behind=True)
+    store._writer.delay = 0.001
+    store.rollup()
+
+    loads = []
+    load = storage.load
+
+    def counting_load(name):
+        loads.append(name)
+        return load(name)
+
+    storage.load = counting_load
+    done = threading.Event()
+
+    def read():
+        while not done.is_set():
+            store.rollup()
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    try:
+        for i in range(300):
+            store.append_log({
+                'activity_id': 'gym', 'activity': '🏋 Gym', 'date': '2026-10-18',
+                'duration': 1.0, 'completed': False,
+            })
+        store.flush()
+    finally:
+        done.set()
+        for reader in readers:
+            reader.join()
+
+    store.rollup()
+    assert loads == []
+    assert store.rollup().day('2026-10-18')['gym']['total'] == 300.0
+
+
+@pytest.mark.parametrize('backend', [JsonStorage, SqliteStorage])
+def test_search_resync_indexes_edits_past_the_preview(tmp_path, backend):
+    data_dir = str(tmp_path / 'data')
+    store = DataStore(backend(data_dir=data_dir))
+    other = DataStore(backend(data_dir=data_dir))
+    notebook = {'id': 'nb1', 'name': 'Plans', 'created': '2026-10-18T09:00:00'}
+    prefix = 'x' * 60
+    store.save_note(notebook, f'{prefix} alpha')
+    assert [doc['id'] for doc in store.search('alpha')] == ['nb1']
+
+    # Saved by another process: same name and preview, different body
+    other.save_note(notebook, f'{prefix} zebra')
+
+    assert [doc['id'] for doc in store.search('zebra')] == ['nb1']
+    assert store.search('alpha') == []
+
+
+def test_idle_namespaces_are_closed(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage_module, 'DATA_DIR', str(tmp_path / 'data'))
+    monkeypatch.setattr(storage_module, '_storages', {})
+    monkeypatch.setattr(datastore, '_stores', {})
+    monkeypatch.setattr(datastore, '_last_used', {})
+    monkeypatch.setattr(datastore, 'IDLE_SECONDS', 0)
+
+    idle = get_store('idle')
+    scheduler = get_scheduler(idle)
+    idle.append_log({
+        'activity_id': 'gym', 'activity': '🏋 Gym', 'date': '2026-10-18',
+        'duration': 1.0, 'completed': False,
+    })
+    busy = get_store('busy')
+    busy.start_timer('gym', None)
+
+    # Any later lookup closes namespaces idle past the cutoff
+    get_store('other')
+    assert idle.closed and not busy.closed
+    idle._writer._thread.join(1)
+    scheduler._thread.join(1)
+    assert not idle._writer._thread.is_alive()
+    assert not scheduler._thread.is_alive()
+    with pytest.raises(sqlite3.ProgrammingError):
+        idle.storage.signature('logs')
+
+    reopened = get_store('idle')
+    assert reopened is not idle
+    assert reopened.rollup().day('2026-10-18')['gym']['total'] == 1.0
+    assert get_scheduler(reopened) is not scheduler
+    assert get_store('busy') is busy
@@ -0,0 +1,109 @@
+import random
+from datetime import date, datetime, timedelta
+
+from indexes import DaySeries, RangeTotals, ReminderQueue
+from models import LogTable, Reminder
+
+NOW = datetime(2026, 10, 18, 12, 0)
+
+
+def reminder(reminder_id, due, completed=False, repeat=None):
+    data = {'id': reminder_id, 'text': reminder_id, 'due': due.isoformat(), 'completed': completed}
+    if repeat:
+        data['repeat'] = repeat
+    return Reminder.from_dict(data)
+
+
+def test_reminder_queue_statuses_and_pages():
+    reminders = [reminder(f'r{i}', NOW + timedelta(hours=i - 5), completed=i == 8) for i in range(10)]
+    queue = ReminderQueue.build(reminders, NOW)
+    assert {status: queue.count(status) for status in queue.STATUSES} == {
+        'active': 3, 'overdue': 6, 'completed': 1
+    }
+    assert [r['id'] for r in queue.page('active', 1, 2)] == ['r7', 'r9']
+
+    fired = queue.pop_due(NOW + timedelta(hours=2))
+    assert [r['id'] for r in fired] == ['r6', 'r7']
+    assert queue.count('overdue') == 8
+    queue.delete('r9')
+    assert queue.count('active') == 0
+    assert queue.next_due() is None
+
+
+def test_repeating_reminder_queues_next_occurrence():
+    queue = ReminderQueue.build([reminder('daily', NOW - timedelta(days=3, hours=3), repeat={'freq': 'daily'})], NOW)
+    assert queue.due['daily'] == datetime(2026, 10, 19, 9, 0)
+    assert not queue.is_overdue('daily')
+
+    fired = queue.pop_due(datetime(2026, 10, 19, 9, 0))
+    assert [r['id'] for r in fired] == ['daily']
+    assert queue.due['daily'] == datetime(2026, 10, 20, 9, 0)
+    assert queue.count('active') == 1
+
+
+def test_skipped_first_occurrence_is_not_fired():
+    rule = {'freq': 'daily', 'except': ['2026-10-20']}
+    queue = ReminderQueue.build([reminder('skip', datetime(2026, 10, 20, 9, 0), repeat=rule)], NOW)
+    assert queue.due['skip'] == datetime(2026, 10, 21, 9, 0)
+    assert queue.pop_due(datetime(2026, 10, 20, 9, 0)) == []
+
+
+def test_finished_series_is_overdue():
+    rule = {'freq': 'daily', 'count': 2}
+    queue = ReminderQueue.build([], NOW)
+    queue.put('done', reminder('done', NOW - timedelta(days=5), repeat=rule))
+    assert queue.is_overdue('done')
+    assert queue.next_due() is None
+
+
+def brute_streak(daily, day):
+    streak = 0
+    while daily.get(day - streak, 0) > 0:
+        streak += 1
+    return streak
+
+
+def test_day_series_matches_brute_force():
+    rng = random.Random(7)
+    base = date(2024, 1, 1).toordinal()
+    daily = {}
+    series = DaySeries({})
+    for _ in range(3000):
+        day = base + rng.randrange(-30, 800)
+        seconds = rng.choice([0.0, 60.0, 600.0])
+        daily[day] = daily.get(day, 0) + seconds
+        series.add(day, seconds)
+    for _ in range(200):
+        first = base + rng.randrange(-60, 850)
+        last = first + rng.randrange(120)
+        expected = sum(total for day, total in daily.items() if first <= day <= last)
+        assert series.total(first, last) == expected
+    for day in range(base - 40, base + 810):
+        assert series.streak(day) == brute_streak(daily, day)
+
+
+def test_day_series_grows_for_days_outside_its_span():
+    start = date(2026, 10, 18).toordinal()
+    series = DaySeries({start: 60.0})
+    series.add(start + 2000, 30.0)
+    series.add(start - 1, 10.0)
+    assert series.total(start - 1, start + 2000) == 100.0
+    assert series.streak(start) == 2
+    assert series.streak(start + 2000) == 1
+
+
+def test_range_totals_follow_appended_logs():
+    activities = {'gym': {'name': 'Gym'}, 'read': {'name': 'Read'}}
+    logs = LogTable([
+        {'activity_id': 'gym', 'activity': 'Gym', 'date': '2026-10-16', 'duration': 600.0, 'completed': False},
+        {'activity_id': None, 'activity': 'Read', 'date': '2026-10-17', 'duration': 300.0, 'completed': False},
+    ])
+    totals = RangeTotals.build(logs, activities)
+    totals.append({'activity_id': 'gym', 'activity': 'Gym', 'date': '2026-10-17', 'duration': 60.0, 'completed': True})
+    assert totals.total('gym', date(2026, 10, 1), date(2026, 10, 31)) == 660.0
+    assert totals.total('read', date(2026, 10, 17), date(2026, 10, 17)) == 300.0
+    assert totals.total(RangeTotals.ALL, date(2026, 10, 17), date(2026, 10, 17)) == 360.0
+    assert totals.streak('gym', date(2026, 10, 17)) == 2
+    assert totals.streak('read', date(2026, 10, 18)) == 0
+    assert totals.daily('gym', date(2026, 10, 15), date(2026, 10, 17)) == [0, 600.0, 60.0]
+    assert totals.total('missing', date(2026, 10, 1), date(2026, 10, 31)) == 0
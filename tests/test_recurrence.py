@@ -0,0 +1,77 @@
+from datetime import datetime
+
+import pytest
+
+from recurrence import describe, last_time, next_occurrence, occurrences, validate_rule
+
+START = datetime(2026, 10, 14, 9, 0)  # a Wednesday
+
+
+def days(moments):
+    return [moment.date().isoformat() for moment in moments]
+
+
+def test_daily_interval_from_window_start():
+    rule = {'freq': 'daily', 'interval': 3}
+    assert days(occurrences(START, rule, datetime(2026, 10, 20), datetime(2026, 10, 30))) == [
+        '2026-10-20', '2026-10-23', '2026-10-26', '2026-10-29'
+    ]
+
+
+def test_window_before_first_occurrence_starts_at_first():
+    rule = {'freq': 'daily'}
+    assert days(occurrences(START, rule, datetime(2026, 1, 1), datetime(2026, 10, 16))) == [
+        '2026-10-14', '2026-10-15'
+    ]
+
+
+def test_weekly_weekdays_count_and_exceptions():
+    rule = validate_rule({'freq': 'weekly', 'weekdays': [0, 2], 'count': 5, 'except': ['2026-10-21']})
+    # Skipped dates still use up the count
+    assert days(occurrences(START, rule, datetime(2026, 1, 1))) == [
+        '2026-10-14', '2026-10-19', '2026-10-26', '2026-10-28'
+    ]
+
+
+def test_weekly_every_other_week():
+    rule = {'freq': 'weekly', 'interval': 2}
+    assert days(occurrences(START, rule, datetime(2026, 10, 15), datetime(2026, 11, 30))) == [
+        '2026-10-28', '2026-11-11', '2026-11-25'
+    ]
+
+
+def test_monthly_skips_months_without_the_day():
+    rule = {'freq': 'monthly'}
+    first = datetime(2026, 1, 31, 9)
+    assert days(occurrences(first, rule, first, datetime(2026, 8, 1))) == [
+        '2026-01-31', '2026-03-31', '2026-05-31', '2026-07-31'
+    ]
+
+
+def test_until_is_inclusive():
+    rule = validate_rule({'freq': 'daily', 'until': '2026-10-16'})
+    assert days(occurrences(START, rule, START)) == ['2026-10-14', '2026-10-15', '2026-10-16']
+    assert last_time(START, rule).date().isoformat() == '2026-10-16'
+
+
+def test_next_occurrence_is_strictly_after():
+    rule = {'freq': 'daily'}
+    assert next_occurrence(START, rule, START) == datetime(2026, 10, 15, 9)
+    assert next_occurrence(START, {'freq': 'daily', 'count': 1}, START) is None
+
+
+@pytest.mark.parametrize('rule', [
+    {'freq': 'yearly'},
+    {'freq': 'daily', 'interval': 0},
+    {'freq': 'weekly', 'weekdays': [7]},
+    {'freq': 'daily', 'count': 0},
+    {'freq': 'daily', 'until': 'not a date'},
+])
+def test_validate_rule_rejects(rule):
+    with pytest.raises(ValueError):
+        validate_rule(rule)
+
+
+def test_describe():
+    rule = validate_rule({'freq': 'weekly', 'interval': 2, 'weekdays': [4, 0], 'count': 3})
+    assert describe(rule) == "every 2 weeks on Mon, Fri, 3 times"
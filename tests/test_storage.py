@@ -0,0 +1,77 @@
+import json
+import multiprocessing
+
+import pytest
+
+import storage as storage_module
+from storage import JsonStorage, SqliteStorage
+
+
+def _open_database(data_dir, barrier, results):
+    barrier.wait()
+    try:
+        SqliteStorage(data_dir=data_dir)
+        results.put(None)
+    except Exception as e:
+        results.put(repr(e))
+
+
+def test_concurrent_first_open_migrates_once(tmp_path):
+    data_dir = str(tmp_path / 'data')
+    legacy = JsonStorage(data_dir)
+    legacy.put('reminders', 'r1', {'id': 'r1', 'text': 'x', 'due': '2026-10-20T10:00:00', 'completed': False})
+
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(3)
+    results = context.Queue()
+    processes = [
+        context.Process(target=_open_database, args=(data_dir, barrier, results)) for _ in range(3)
+    ]
+    for process in processes:
+        process.start()
+    errors = [results.get(timeout=60) for _ in processes]
+    for process in processes:
+        process.join(60)
+    assert errors == [None, None, None]
+    assert [r['id'] for r in SqliteStorage(data_dir=data_dir).load('reminders')] == ['r1']
+
+
+def test_open_after_stale_migration_check(tmp_path, monkeypatch):
+    data_dir = str(tmp_path / 'data')
+    SqliteStorage(data_dir=data_dir)
+
+    # Behave like a process that read the flags just before another one
+    # committed the migration: the first read of each flag misses
+    real_meta = SqliteStorage._meta
+    missed = set()
+
+    def stale_meta(self, key):
+        if key not in missed:
+            missed.add(key)
+            return None
+        return real_meta(self, key)
+
+    monkeypatch.setattr(SqliteStorage, '_meta', stale_meta)
+    SqliteStorage(data_dir=data_dir)
+    assert missed == {'migrated', 'notes_split'}
+
+
+def test_json_revisions_read_only_the_requested_range(tmp_path):
+    storage = JsonStorage(str(tmp_path / 'data'))
+    for rev in range(1, 201):
+        storage.append_note_revision('nb1', {'rev': rev, 'saved': '2026-10-18T09:00:00', 'size': rev})
+    assert [r['rev'] for r in storage.load_note_revisions('nb1', 5, 8)] == [5, 6, 7, 8]
+
+    # Once indexed, a range is read from its first line and stops after its last
+    parsed = []
+    loads = json.loads
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(storage_module.json, 'loads', lambda data: parsed.append(data) or loads(data))
+        assert [r['rev'] for r in storage.load_note_revisions('nb1', 150, 152)] == [150, 151, 152]
+    assert len(parsed) == 4
+
+    storage.append_note_revision('nb1', {'rev': 201, 'saved': '2026-10-18T09:00:00', 'size': 201})
+    assert [r['rev'] for r in storage.load_note_revisions('nb1', 200)] == [200, 201]
+    storage.delete_note_revisions('nb1')
+    storage.append_note_revision('nb1', {'rev': 1, 'saved': '2026-10-18T09:00:00', 'size': 1})
+    assert [r['rev'] for r in storage.load_note_revisions('nb1')] == [1]
@@ -0,0 +1,265 @@
+"""Bulk import and export of logs, reminders and calendar events.
+
+    python transfer.py import logs history.csv
+    python transfer.py export logs logs.jsonl.gz --user <id>
+
+Files are CSV or JSONL (optionally gzipped), picked by extension or
+``--format``; ``-`` reads stdin or writes stdout. Records stream through
+generators and are written in batches, so memory stays bounded by the
+batch size however long the file is.
+"""
+import argparse
+import csv
+import gzip
+import json
+import math
+import sys
+import time
+import uuid
+from contextlib import nullcontext
+from datetime import date, datetime
+from itertools import islice
+
+from datastore import get_store
+from models import to_stored
+from recurrence import validate_rule
+
+FIELDS = {
+    'logs': ('activity_id', 'activity', 'date', 'start_time', 'duration', 'completed'),
+    'reminders': ('id', 'text', 'due', 'completed', 'repeat'),
+    'calendar_events': ('id', 'text', 'due', 'color', 'repeat'),
+}
+
+BATCH_SIZE = 5000
+MAX_ERRORS = 20
+
+
+def _bool(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value if value is not None else '').strip().lower()
+    if text in ('1', 'true', 'yes', 'y'):
+        return True
+    if text in ('', '0', 'false', 'no', 'n', 'none'):
+        return False
+    raise ValueError(f"not a boolean: {value!r}")
+
+
+def _timestamp(value):
+    return datetime.fromisoformat(str(value).strip()).isoformat()
+
+
+def _text(row, field):
+    text = str(row.get(field) or '').strip()
+    if not text:
+        raise ValueError(f"missing {field}")
+    return text
+
+
+def clean_log(row):
+    if not (row.get('activity_id') or row.get('activity')):
+        raise ValueError("missing activity_id or activity")
+    duration = float(row['duration'])
+    if not math.isfinite(duration) or duration < 0:
+        raise ValueError(f"bad duration: {row['duration']!r}")
+    entry = {
+        'activity_id': row.get('activity_id') or None,
+        'activity': row.get('activity') or '',
+        'date': date.fromisoformat(str(row['date']).strip()[:10]).isoformat(),
+        'duration': duration,
+        'completed': _bool(row.get('completed')),
+    }
+    if row.get('start_time'):
+        entry['start_time'] = _timestamp(row['start_time'])
+    return entry
+
+
+def _with_repeat(record, row):
+    # CSV carries the repeat rule as a JSON cell
+    rule = row.get('repeat')
+    if isinstance(rule, str):
+        rule = json.loads(rule) if rule.strip() else None
+    if rule:
+        record['repeat'] = validate_rule(rule)
+    return record
+
+
+def clean_reminder(row):
+    return _with_repeat({
+        'id': str(row.get('id') or uuid.uuid4()),
+        'text': _text(row, 'text'),
+        'due': _timestamp(row['due']),
+        'completed': _bool(row.get('completed')),
+    }, row)
+
+
+def clean_event(row):
+    return _with_repeat({
+        'id': str(row.get('id') or uuid.uuid4()),
+        'text': _text(row, 'text'),
+        'due': _timestamp(row['due']),
+        'color': row.get('color') or '#ff6b6b',
+    }, row)
+
+
+CLEANERS = {
+    'logs': clean_log,
+    'reminders': clean_reminder,
+    'calendar_events': clean_event,
+}
+
+
+class TransferStats:
+    """Running counts for an import or export, with throughput."""
+
+    def __init__(self):
+        self.records = 0
+        self.skipped = 0
+        self.errors = []
+        self.started = time.monotonic()
+
+    def error(self, line, message):
+        self.skipped += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((line, message))
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def rate(self):
+        return self.records / max(self.elapsed(), 1e-9)
+
+    def summary(self):
+        text = f"{self.records:,} records in {self.elapsed():.1f}s ({self.rate():,.0f}/s)"
+        if self.skipped:
+            text += f", {self.skipped:,} skipped"
+        return text
+
+
+def file_format(path, fmt=None):
+    if fmt:
+        return fmt
+    name = path[:-3] if path.endswith('.gz') else path
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    raise ValueError(f"Cannot tell the format of {path}; pass --format")
+
+
+def open_file(path, mode):
+    if path == '-':
+        return nullcontext(sys.stdin if mode == 'r' else sys.stdout)
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', newline='', encoding='utf-8')
+    return open(path, mode, newline='', encoding='utf-8')
+
+
+def read_rows(f, fmt):
+    """Yield ``(line, row)``; JSONL rows stay raw text until validated."""
+    if fmt == 'csv':
+        reader = csv.DictReader(f)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line, text in enumerate(f, 1):
+            if text.strip():
+                yield line, text
+
+
+def clean_rows(collection, rows, stats):
+    clean = CLEANERS[collection]
+    for line, row in rows:
+        try:
+            yield clean(json.loads(row) if isinstance(row, str) else row)
+        except (KeyError, ValueError, TypeError, AttributeError) as e:
+            stats.error(line, f"{type(e).__name__}: {e}")
+
+
+def chunked(records, size):
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def import_records(store, collection, f, fmt, batch_size=BATCH_SIZE, progress=None):
+    """Validate rows from ``f`` and write them to ``store`` in batches."""
+    stats = TransferStats()
+    for chunk in chunked(clean_rows(collection, read_rows(f, fmt), stats), batch_size):
+        if collection == 'logs':
+            store.append_logs(chunk)
+        else:
+            store.put_many(collection, chunk)
+        stats.records += len(chunk)
+        if progress:
+            progress(stats)
+    return stats
+
+
+def export_records(store, collection, f, fmt, batch_size=BATCH_SIZE, progress=None):
+    """Stream a collection to ``f``; logs are read straight from the backend."""
+    stats = TransferStats()
+    if collection == 'logs':
+        records = store.iter_logs()
+    else:
+        records = (to_stored(record) for record in store.get(collection))
+    if fmt == 'csv':
+        writer = csv.DictWriter(f, fieldnames=FIELDS[collection], extrasaction='ignore')
+        writer.writeheader()
+
+        def write(record):
+            if record.get('repeat'):
+                record = {**record, 'repeat': json.dumps(record['repeat'])}
+            writer.writerow(record)
+    else:
+        def write(record):
+            f.write(json.dumps(record, default=str) + '\n')
+    for chunk in chunked(records, batch_size):
+        for record in chunk:
+            write(record)
+        stats.records += len(chunk)
+        if progress:
+            progress(stats)
+    return stats
+
+
+def report_progress(stats):
+    sys.stderr.write(f"\r{stats.records:,} records ({stats.rate():,.0f}/s)")
+    sys.stderr.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('command', choices=('import', 'export'))
+    parser.add_argument('collection', choices=sorted(FIELDS))
+    parser.add_argument('path', help="CSV or JSONL file, optionally .gz; '-' for stdin/stdout")
+    parser.add_argument('--format', choices=('csv', 'jsonl'))
+    parser.add_argument('--user', help="user namespace id in multi-user mode")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--quiet', action='store_true', help="no progress output")
+    args = parser.parse_args(argv)
+
+    try:
+        fmt = file_format(args.path, args.format)
+    except ValueError as e:
+        parser.error(str(e))
+    store = get_store(args.user)
+    progress = None if args.quiet else report_progress
+    run = import_records if args.command == 'import' else export_records
+    with open_file(args.path, 'r' if args.command == 'import' else 'w') as f:
+        stats = run(store, args.collection, f, fmt, args.batch_size, progress)
+    if progress:
+        sys.stderr.write('\n')
+    print(f"{args.command.capitalize()}ed {stats.summary()}", file=sys.stderr)
+    for line, message in stats.errors:
+        print(f"  line {line}: {message}", file=sys.stderr)
+    if stats.skipped > len(stats.errors):
+        print(f"  ... and {stats.skipped - len(stats.errors):,} more", file=sys.stderr)
+    return 1 if stats.skipped else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,134 @@
+import atexit
+import threading
+import time
+
+
+class WriteBehind:
+    """Background thread persisting a store's changes after they are cached.
+
+    Changes are keyed by ``(collection, record id)`` so a burst of writes to
+    one record leaves only the last; appends get a unique key each. Once a
+    change is queued the worker waits until no more arrive for ``delay``
+    seconds, but never longer than ``max_delay``, then writes the whole
+    queue in one storage batch. A failed batch is put back in front of
+    newer changes and retried. ``flush()`` waits for the queue to drain and
+    also runs at interpreter exit; ``close()`` drains it and stops the thread.
+    """
+
+    def __init__(self, storage, on_written, delay=0.05, max_delay=1.0):
+        self.storage = storage
+        self.on_written = on_written
+        self.delay = delay
+        self.max_delay = max_delay
+        self.last_error = None
+        self._failures = 0
+        self._cond = threading.Condition()
+        self._ops = {}
+        self._writing = set()
+        self._first = None
+        self._seq = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+        self._thread.start()
+        atexit.register(self.flush, timeout=30)
+
+    def submit(self, name, record_id, method, *args):
+        with self._cond:
+            if record_id is None:
+                self._seq += 1
+                record_id = ('append', self._seq)
+            key = (name, record_id)
+            # Re-inserting moves the key to the end, so writes keep their latest order
+            self._ops.pop(key, None)
+            self._ops[key] = (method, args)
+            if self._first is None:
+                self._first = time.monotonic()
+            self._cond.notify_all()
+
+    def has_pending(self, name):
+        with self._cond:
+            return name in self._writing or any(key[0] == name for key in self._ops)
+
+    def _take(self):
+        with self._cond:
+            while not self._ops:
+                if self._closed:
+                    return None
+                self._cond.wait()
+            while True:
+                count = len(self._ops)
+                remaining = self._first + self.max_delay - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(min(self.delay, remaining))
+                if len(self._ops) == count:
+                    break
+            ops = self._ops
+            self._ops = {}
+            self._first = None
+            self._writing = {name for name, _ in ops}
+            return ops
+
+    def _run(self):
+        while True:
+            ops = self._take()
+            if ops is None:
+                return
+            try:
+                with self.storage.batch():
+                    for method, args in ops.values():
+                        getattr(self.storage, method)(*args)
+            except Exception as e:
+                with self._cond:
+                    self.last_error = e
+                    self._failures += 1
+                    ops.update(self._ops)
+                    self._ops = ops
+                    self._first = time.monotonic()
+                    self._writing = set()
+                    self._cond.notify_all()
+                time.sleep(self.max_delay)
+                continue
+            # The store records the new storage state while the names still
+            # count as pending, so no reader mistakes its own writes for an
+            # outside change and reloads
+            try:
+                self.on_written(set(self._writing))
+            finally:
+                with self._cond:
+                    self.last_error = None
+                    self._writing = set()
+                    self._cond.notify_all()
+
+    def idle(self):
+        with self._cond:
+            return not self._ops and not self._writing
+
+    def flush(self, timeout=None, stop_on_error=False):
+        """Write everything queued now and wait for it.
+
+        Returns False on timeout or, with ``stop_on_error``, as soon as a
+        write attempted after the call fails; the failed changes stay queued
+        for retry.
+        """
+        with self._cond:
+            failures = self._failures
+            if self._ops:
+                self._first = time.monotonic() - self.max_delay
+                self._cond.notify_all()
+            self._cond.wait_for(
+                lambda: (not self._ops and not self._writing) or (stop_on_error and self._failures > failures),
+                timeout
+            )
+            return not self._ops and not self._writing
+
+    def close(self, timeout=None):
+        """Drain the queue and stop the worker; False if changes are still unsaved."""
+        if not self.flush(timeout, stop_on_error=True):
+            return False
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        atexit.unregister(self.flush)
+        return True